@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import arxiv
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'PAPERS_ARXIV_CACHE',
+    os.path.join(os.getcwd(), '.papers_cache', 'arxiv_queries.sqlite3'),
+)
+DEFAULT_TTL_SECONDS = float(os.environ.get('PAPERS_ARXIV_CACHE_TTL_HOURS', 24)) * 3600
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PAPERS_ARXIV_CACHE_MAX_ENTRIES', 2000))
+
+ARXIV_OPERATORS = {"AND", "OR", "ANDNOT"}
+
+def normalize_query(query):
+    """Collapse whitespace and lowercase search terms; boolean operators stay uppercase"""
+    return re.sub(
+        r"[^\s()\"]+",
+        lambda match: match.group(0) if match.group(0) in ARXIV_OPERATORS else match.group(0).lower(),
+        " ".join(query.split()),
+    )
+
+def result_to_dict(result):
+    """JSON-serializable fields of an arxiv.Result"""
+    return {
+        "entry_id": result.entry_id,
+        "updated": result.updated.isoformat(),
+        "published": result.published.isoformat(),
+        "title": result.title,
+        "authors": [author.name for author in result.authors],
+        "summary": result.summary,
+        "comment": result.comment,
+        "journal_ref": result.journal_ref,
+        "doi": result.doi,
+        "primary_category": result.primary_category,
+        "categories": list(result.categories),
+        "links": [
+            {"href": link.href, "title": link.title, "rel": link.rel, "content_type": link.content_type}
+            for link in result.links
+        ],
+    }
+
+def result_from_dict(data):
+    """Rebuild an arxiv.Result from result_to_dict output"""
+    return arxiv.Result(
+        entry_id=data["entry_id"],
+        updated=datetime.fromisoformat(data["updated"]),
+        published=datetime.fromisoformat(data["published"]),
+        title=data["title"],
+        authors=[arxiv.Result.Author(name) for name in data["authors"]],
+        summary=data["summary"],
+        comment=data["comment"],
+        journal_ref=data["journal_ref"],
+        doi=data["doi"],
+        primary_category=data["primary_category"],
+        categories=data["categories"],
+        links=[arxiv.Result.Link(**link) for link in data["links"]],
+    )
+
+class ArxivQueryCache:
+    """On-disk cache of arXiv search results shared by every session and process.
+
+    Keys are the normalized query plus sort criterion, sort order, result
+    limit and offset. Entries expire after ttl seconds, and past max_entries
+    the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS arxiv_queries (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS arxiv_queries_last_used ON arxiv_queries (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def search_key(search, offset=0):
+        return json.dumps([
+            normalize_query(search.query),
+            search.sort_by.value,
+            search.sort_order.value,
+            search.max_results,
+            offset,
+        ])
+
+    def get(self, key):
+        """Cached list of arxiv.Result for key, or None if missing or expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT results, created FROM arxiv_queries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM arxiv_queries WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE arxiv_queries SET last_used = ? WHERE key = ?", (now, key))
+        return [result_from_dict(data) for data in json.loads(row[0])]
+
+    def has(self, search, offset=0):
+        """Whether unexpired results for search at offset are cached"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT created FROM arxiv_queries WHERE key = ?", (self.search_key(search, offset),)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def put(self, key, results):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO arxiv_queries VALUES (?, ?, ?, ?)",
+                (key, json.dumps([result_to_dict(result) for result in results]), now, now),
+            )
+            conn.execute("DELETE FROM arxiv_queries WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                """DELETE FROM arxiv_queries WHERE key IN (
+                    SELECT key FROM arxiv_queries ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def results(self, client, search, offset=0):
+        """Drop-in for client.results(search, offset) that serves repeats from the cache
+
+        On a miss the live results are yielded as they arrive and stored only
+        once the search has been read to the end.
+        """
+        key = self.search_key(search, offset)
+        cached = self.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+        fetched = []
+        for result in client.results(search, offset):
+            fetched.append(result)
+            yield result
+        self.put(key, fetched)
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_arxiv_cache():
+    """Process-wide ArxivQueryCache at DEFAULT_CACHE_PATH"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArxivQueryCache()
+        return _default_cache
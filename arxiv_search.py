@@ -0,0 +1,153 @@
+import os
+import queue
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import arxiv
+from arxiv_cache import get_arxiv_cache, DEFAULT_TTL_SECONDS
+from paper_store import get_paper_store, DEFAULT_MIN_LOCAL_HITS
+
+# Results per arXiv API request, and the most results a single query may page through
+DEFAULT_PAGE_SIZE = int(os.environ.get('PAPERS_ARXIV_PAGE_SIZE', 25))
+DEFAULT_MAX_RESULTS = int(os.environ.get('PAPERS_ARXIV_MAX_RESULTS', 100))
+
+_DONE = object()
+
+class ClientPool:
+    """A fixed set of arXiv clients, each leased to one thread at a time
+
+    Clients keep their HTTP session and politeness delay across leases, and
+    the pool size caps how many requests run at once, however many sessions
+    and queries share the pool.
+    """
+
+    def __init__(self, create_client, size):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(create_client())
+
+    @contextmanager
+    def lease(self):
+        client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+def local_results(search, min_local_hits=DEFAULT_MIN_LOCAL_HITS, store=None, max_age=DEFAULT_TTL_SECONDS):
+    """Answer to an arxiv.Search from the local paper store, or None when the live API should be asked
+
+    Only papers fetched less than max_age seconds ago are matched, so new
+    papers still show up once the cache TTL has passed. The local answer is
+    used when at least min_local_hits of them (or max_results, if smaller)
+    match, whether or not this exact query was ever fetched.
+    """
+    store = store or get_paper_store()
+    local = store.search(search.query, search.max_results, search.sort_by, search.sort_order, max_age=max_age)
+    needed = min_local_hits if search.max_results is None else min(min_local_hits, search.max_results)
+    if local is None or len(local) < needed:
+        return None
+    return local
+
+def live_results(client, search, offset=0, store=None):
+    """Results from offset on from the query cache or the live API, each one added to the local store"""
+    store = store or get_paper_store()
+    fetched = []
+    try:
+        for result in get_arxiv_cache().results(client, search, offset):
+            fetched.append(result)
+            yield result
+    finally:
+        store.upsert(fetched)
+
+def search_results(client, search, offset=0, min_local_hits=DEFAULT_MIN_LOCAL_HITS, store=None,
+                   max_age=DEFAULT_TTL_SECONDS):
+    """Results for an arxiv.Search from offset on, answered from the local paper store when possible
+
+    Exact repeats still in the query cache are served from it, which keeps
+    arXiv's own ordering.
+    """
+    store = store or get_paper_store()
+    local = None if get_arxiv_cache().has(search, offset) else local_results(search, min_local_hits, store, max_age)
+    if local is not None:
+        yield from local[offset:]
+    else:
+        yield from live_results(client, search, offset, store)
+
+def iter_query_pages(client, query, page_size=DEFAULT_PAGE_SIZE, max_results=DEFAULT_MAX_RESULTS,
+                     sort_by=arxiv.SortCriterion.Relevance, wants_more=None, store=None):
+    """Results of one query, fetched a page at a time only as long as they are wanted
+
+    After each page, wants_more(pages) gets the pages fetched so far and
+    decides whether the next one is worth a request. Paging also stops at a
+    short page or at max_results. The client should use the same page_size
+    so that each page is a single API request.
+
+    Whether the query is answered locally is decided once, before the first
+    page: the pages written to the store by a live first page must not turn
+    the following pages into (mostly empty) local answers. A query whose
+    first page is still in the query cache is paged through the cache.
+    """
+    store = store or get_paper_store()
+    first_page = arxiv.Search(query=query, max_results=min(page_size, max_results), sort_by=sort_by)
+    local = None
+    if not get_arxiv_cache().has(first_page):
+        local = local_results(arxiv.Search(query=query, max_results=max_results, sort_by=sort_by), store=store)
+    pages = []
+    offset = 0
+    while offset < max_results:
+        size = min(page_size, max_results - offset)
+        if local is not None:
+            page = local[offset:offset + size]
+            yield from page
+        else:
+            search = arxiv.Search(query=query, max_results=offset + size, sort_by=sort_by)
+            page = []
+            for result in live_results(client, search, offset, store):
+                page.append(result)
+                yield result
+        pages.append(page)
+        offset += size
+        if len(page) < size or (wants_more is not None and not wants_more(pages)):
+            return
+
+def iter_concurrent_results(queries, client_factory=None, max_results=DEFAULT_MAX_RESULTS,
+                            sort_by=arxiv.SortCriterion.Relevance, max_workers=5,
+                            page_size=DEFAULT_PAGE_SIZE, wants_more=None, client_pool=None):
+    """Run arXiv queries concurrently, yielding (query, result, error) as results arrive
+
+    Every query gets its own client from client_factory, so each one keeps
+    its own politeness delay between pages while the queries overlap; with
+    client_pool, each query leases a client from the pool instead. A
+    failing query yields a single (query, None, error) and does not stop the
+    others. Iteration happens in the caller's thread, which keeps Streamlit
+    calls out of the workers. Each query is paged lazily with
+    iter_query_pages, so it is answered locally or from the query cache
+    whenever possible.
+    """
+    queries = list(dict.fromkeys(queries))
+    if not queries:
+        return
+    arrivals = queue.Queue()
+
+    def run_query(query):
+        try:
+            lease = client_pool.lease() if client_pool else nullcontext(client_factory(page_size=page_size))
+            with lease as client:
+                for result in iter_query_pages(client, query, page_size, max_results, sort_by, wants_more):
+                    arrivals.put((query, result, None))
+        except Exception as e:
+            arrivals.put((query, None, e))
+        finally:
+            arrivals.put((query, _DONE, None))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as pool:
+        for query in queries:
+            pool.submit(run_query, query)
+        running = len(queries)
+        while running:
+            query, result, error = arrivals.get()
+            if result is _DONE:
+                running -= 1
+                continue
+            yield query, result, error
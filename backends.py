@@ -0,0 +1,298 @@
+import os
+import re
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+import arxiv
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from google.api_core import exceptions as api_exceptions
+
+# --- LLM backends ---
+
+class GeminiBackend:
+    """Live Gemini models"""
+    name = "gemini"
+
+    def create_model(self, model_name, generation_config, system_instruction=None, api_key=None):
+        """Model using api_key, or the key from genai.configure when api_key is None"""
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            system_instruction=system_instruction,
+        )
+        if api_key:
+            # A client of its own, so models of different users never share the global key
+            manager = genai_client._ClientManager()
+            manager.configure(api_key=api_key)
+            model._client = manager.make_client("generative")
+        return model
+
+MOCK_CATEGORIES = ["Consciousness", "Reasoning", "Psychology", "NLP", "Neuroscience", "Robotics"]
+
+def _stable_hash(text):
+    return zlib.crc32(text.encode('utf-8'))
+
+def _mock_reply(prompt, system_instruction=""):
+    """Deterministic reply in the format each prompt of this repo asks for"""
+    document_ids = re.findall(r'<document id="(\d+)">\n(.*?)\n</document>', prompt, re.DOTALL)
+    if document_ids:
+        return "\n".join(
+            f'<explanation id="{doc_id}">Mock explanation for document {doc_id}</explanation>\n'
+            f'<answer id="{doc_id}">{MOCK_CATEGORIES[_stable_hash(content) % len(MOCK_CATEGORIES)]}</answer>'
+            for doc_id, content in document_ids
+        )
+
+    category = MOCK_CATEGORIES[_stable_hash(prompt) % len(MOCK_CATEGORIES)]
+    if "<category>CategoryName</category>" in prompt:
+        return f"<title>Mock Paper {_stable_hash(prompt) % 10000}</title>\nMock explanation\n<category>{category}</category>"
+    if "<answer>CategoryName</answer>" in prompt:
+        return f"Mock explanation of the category\n<answer>{category}</answer>"
+
+    titles = re.findall(r"- ####'(.*?)':", prompt)
+    if titles:
+        tag = "paper-card" if "<paper-card>" in prompt + system_instruction else "paper"
+        cited = "\n\n".join(f"<{tag}>{title}</{tag}>" for title in titles[:5])
+        return f"I selected the following papers because they match the request\n\n{cited}\n"
+
+    if "QUERY" in prompt or "<query>" in prompt:
+        # Build queries from the quoted user prompt when there is one
+        quoted = re.search(r"'(.+?)'|User Prompt: (.+)", prompt)
+        source = next((group for group in quoted.groups() if group), prompt) if quoted else prompt
+        words = list(dict.fromkeys(word.lower() for word in re.findall(r"[A-Za-z]{4,}", source)))
+        return "\n".join(f"<query>all:{word}</query>" for word in (words or ["reasoning"])[:3])
+
+    return "Mock answer."
+
+class MockChunk:
+    def __init__(self, text):
+        self.text = text
+
+class MockResponse:
+    """Stand-in for GenerateContentResponse; iterating it streams the reply in timed chunks"""
+
+    def __init__(self, text, seconds_per_char, chunk_chars=32):
+        self._text = text
+        self._seconds_per_char = seconds_per_char
+        self._chunk_chars = chunk_chars
+
+    @property
+    def text(self):
+        return self._text
+
+    def __iter__(self):
+        for start in range(0, len(self._text), self._chunk_chars):
+            chunk = self._text[start:start + self._chunk_chars]
+            time.sleep(len(chunk) * self._seconds_per_char)
+            yield MockChunk(chunk)
+
+class MockGenerativeModel:
+    """Stand-in for genai.GenerativeModel with configurable latency, token rate and 429s"""
+
+    def __init__(self, backend, model_name, system_instruction=None):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+
+    def generate_content(self, contents, stream=False):
+        prompt = contents if isinstance(contents, str) else "\n".join(str(part) for part in contents)
+        self.backend.maybe_fail()
+        time.sleep(self.backend.latency)
+        text = _mock_reply(prompt, self.system_instruction)
+        # About 4 characters per token
+        seconds_per_char = 1 / (4 * self.backend.tokens_per_second) if self.backend.tokens_per_second else 0
+        if not stream:
+            time.sleep(len(text) * seconds_per_char)
+            seconds_per_char = 0
+        return MockResponse(text, seconds_per_char)
+
+    def start_chat(self, history=None):
+        return MockChatSession(self, history)
+
+class MockChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False):
+        response = self.model.generate_content(content, stream=stream)
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [response.text]})
+        return response
+
+class MockLLMBackend:
+    """Offline, deterministic LLM backend
+
+    latency is the seconds before a reply starts, tokens_per_second paces the
+    reply (0 means instant) and error_rate is the chance that a request
+    raises a 429.
+    """
+    name = "mock"
+
+    def __init__(self, latency=0.0, tokens_per_second=0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise api_exceptions.TooManyRequests("429 Resource has been exhausted (mock)")
+
+    def create_model(self, model_name, generation_config, system_instruction=None, api_key=None):
+        return MockGenerativeModel(self, model_name, system_instruction)
+
+# --- Search backends ---
+
+class ArxivSearchBackend:
+    """Live arXiv API"""
+    name = "arxiv"
+
+    def create_client(self, **kwargs):
+        return arxiv.Client(**kwargs)
+
+MOCK_VOCABULARY = [
+    "reasoning", "language", "models", "consciousness", "attention", "memory", "learning",
+    "neural", "cognitive", "architecture", "planning", "agents", "graph", "retrieval",
+    "benchmark", "transformer", "reinforcement", "perception", "symbolic", "causal",
+    "robust", "efficient", "multimodal", "theory", "brain", "emergent", "evaluation",
+]
+MOCK_AUTHORS = ["Ada Lovelace", "Alan Turing", "Grace Hopper", "Claude Shannon", "Marvin Minsky", "Judea Pearl"]
+
+def mock_paper(index):
+    """Deterministic arxiv.Result for paper number index of the mock corpus"""
+    rng = random.Random(index)
+    short_id = f"{2001 + index // 100000}.{index % 100000:05d}v{rng.randint(1, 3)}"
+    title = " ".join(rng.sample(MOCK_VOCABULARY, 6)).capitalize()
+    published = datetime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(days=index % 1800)
+    return arxiv.Result(
+        entry_id=f"http://arxiv.org/abs/{short_id}",
+        updated=published,
+        published=published,
+        title=f"{title} ({index})",
+        authors=[arxiv.Result.Author(name) for name in rng.sample(MOCK_AUTHORS, 2)],
+        summary=" ".join(rng.choice(MOCK_VOCABULARY) for _ in range(120)) + ".",
+        journal_ref=f"Mock Journal {index % 7}" if index % 3 == 0 else "",
+        primary_category="cs.AI",
+        categories=["cs.AI", "cs.CL"],
+        links=[
+            arxiv.Result.Link(f"http://arxiv.org/abs/{short_id}", rel="alternate"),
+            arxiv.Result.Link(f"http://arxiv.org/pdf/{short_id}", title="pdf", rel="related"),
+        ],
+    )
+
+class MockArxivClient:
+    """Stand-in for arxiv.Client serving a fixed synthetic corpus
+
+    Each query maps deterministically onto papers of the corpus. Every page
+    of page_size results waits page_latency seconds, and error_rate is the
+    chance that a page request fails with HTTP 429. Like arxiv.Client,
+    requests of one client are spaced at least delay_seconds apart (the
+    backend's delay_seconds by default) and a failed page is retried up to
+    num_retries times.
+    """
+
+    def __init__(self, backend, page_size=100, delay_seconds=None, num_retries=3):
+        self.backend = backend
+        self.page_size = page_size
+        self.delay_seconds = backend.delay_seconds if delay_seconds is None else delay_seconds
+        self.num_retries = num_retries
+        self._last_request = None
+
+    def _request_page(self, query):
+        for attempt in range(self.num_retries + 1):
+            if self._last_request is not None:
+                time.sleep(max(0.0, self._last_request + self.delay_seconds - time.monotonic()))
+            self._last_request = time.monotonic()
+            try:
+                self.backend.maybe_fail(query)
+            except arxiv.HTTPError:
+                if attempt == self.num_retries:
+                    raise
+                continue
+            time.sleep(self.backend.page_latency)
+            return
+
+    def results(self, search, offset=0):
+        limit = search.max_results if search.max_results is not None else self.backend.corpus_size
+        rng = random.Random(_stable_hash(search.query))
+        indices = rng.sample(range(self.backend.corpus_size), min(limit, self.backend.corpus_size))
+        for position in range(offset, len(indices)):
+            if (position - offset) % self.page_size == 0:
+                self._request_page(search.query)
+            yield mock_paper(indices[position])
+
+class MockSearchBackend:
+    """Offline arXiv backend over a synthetic corpus of corpus_size papers"""
+    name = "mock"
+
+    def __init__(self, page_latency=0.0, error_rate=0.0, corpus_size=5000, seed=0, delay_seconds=0.0):
+        self.page_latency = page_latency
+        self.delay_seconds = delay_seconds
+        self.error_rate = error_rate
+        self.corpus_size = corpus_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def maybe_fail(self, query):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise arxiv.HTTPError(f"mock://arxiv?search_query={query}", 0, 429)
+
+    def create_client(self, **kwargs):
+        return MockArxivClient(self, **kwargs)
+
+# --- Backend selection ---
+
+_llm_backend = None
+_search_backend = None
+_backend_lock = threading.Lock()
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+def get_llm_backend():
+    """Current LLM backend; PAPERS_LLM_BACKEND=mock selects the offline one"""
+    global _llm_backend
+    with _backend_lock:
+        if _llm_backend is None:
+            if os.environ.get("PAPERS_LLM_BACKEND") == "mock":
+                _llm_backend = MockLLMBackend(
+                    latency=_env_float("PAPERS_MOCK_LATENCY", 0),
+                    tokens_per_second=_env_float("PAPERS_MOCK_TOKENS_PER_SECOND", 0),
+                    error_rate=_env_float("PAPERS_MOCK_ERROR_RATE", 0),
+                )
+            else:
+                _llm_backend = GeminiBackend()
+        return _llm_backend
+
+def set_llm_backend(backend):
+    global _llm_backend
+    with _backend_lock:
+        _llm_backend = backend
+
+def get_search_backend():
+    """Current search backend; PAPERS_SEARCH_BACKEND=mock selects the offline one"""
+    global _search_backend
+    with _backend_lock:
+        if _search_backend is None:
+            if os.environ.get("PAPERS_SEARCH_BACKEND") == "mock":
+                _search_backend = MockSearchBackend(
+                    page_latency=_env_float("PAPERS_MOCK_PAGE_LATENCY", 0),
+                    error_rate=_env_float("PAPERS_MOCK_ERROR_RATE", 0),
+                    delay_seconds=_env_float("PAPERS_MOCK_ARXIV_DELAY", 0),
+                )
+            else:
+                _search_backend = ArxivSearchBackend()
+        return _search_backend
+
+def set_search_backend(backend):
+    global _search_backend
+    with _backend_lock:
+        _search_backend = backend
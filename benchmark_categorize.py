@@ -0,0 +1,158 @@
+"""Benchmark of the reorder_all categorization pipeline against the mock LLM.
+
+Generates a synthetic PDF corpus, runs walk -> extract -> classify -> move
+with process_pdfs and appends one JSON line per run to the results file:
+configuration, files/sec, per-stage latency percentiles and peak RSS.
+
+    python benchmark_categorize.py --files 500 --pages 20 --mock-latency 0.5
+"""
+import os
+import sys
+import json
+import argparse
+import contextlib
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from backends import MOCK_VOCABULARY
+
+def write_synthetic_pdf(path, pages, rng, lines_per_page=40):
+    """Write a minimal text-only PDF with random vocabulary on every page"""
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id in page_ids:
+        lines = [" ".join(rng.choice(MOCK_VOCABULARY) for _ in range(10)) for _ in range(lines_per_page)]
+        stream = ("BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({line}) '" for line in lines) + " ET").encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref_offset = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    body += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, 'wb') as file:
+        file.write(body)
+
+def generate_corpus(folder, files, pages, seed=0):
+    """Create files synthetic PDFs of pages pages each, spread over a few subfolders"""
+    rng = random.Random(seed)
+    for i in range(files):
+        subfolder = os.path.join(folder, f"inbox_{i % 4}")
+        os.makedirs(subfolder, exist_ok=True)
+        write_synthetic_pdf(os.path.join(subfolder, f"paper_{i:05d}.pdf"), pages, rng)
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished children, in MB"""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PDF categorization pipeline with a mock LLM')
+    parser.add_argument('--files', type=int, default=200, help='Synthetic PDFs to generate')
+    parser.add_argument('--pages', type=int, default=10, help='Pages per synthetic PDF')
+    parser.add_argument('--extract-workers', type=int, default=None)
+    parser.add_argument('--llm-workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--mock-latency', type=float, default=0.2, help='Seconds before each mock reply')
+    parser.add_argument('--mock-tokens-per-second', type=float, default=0, help='Mock output rate (0 = instant)')
+    parser.add_argument('--mock-error-rate', type=float, default=0.0, help='Fraction of mock requests failing with 429')
+    parser.add_argument('--rpm', type=float, default=1e6, help='Requests/min allowed by the rate limiter')
+    parser.add_argument('--warm', action='store_true', help='Run once before measuring so the text cache is warm')
+    parser.add_argument('--output', default='bench_results.jsonl', help='JSON lines file the result is appended to')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated corpus and caches')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_categorize_')
+    # The cache, manifest and limiter read their configuration at import time
+    os.environ['PAPERS_TEXT_CACHE'] = os.path.join(workdir, 'pdf_text.sqlite3')
+    os.environ['PAPERS_MANIFEST'] = os.path.join(workdir, 'manifest.sqlite3')
+    os.environ['GEMINI_RPM'] = str(args.rpm)
+    os.environ['GEMINI_TPM'] = str(1e12)
+
+    import reorder_all
+    from backends import MockLLMBackend, set_llm_backend
+    from gemini_models import timings as model_timings
+
+    set_llm_backend(MockLLMBackend(
+        latency=args.mock_latency,
+        tokens_per_second=args.mock_tokens_per_second,
+        error_rate=args.mock_error_rate,
+    ))
+
+    papers = os.path.join(workdir, 'papers')
+    generate_corpus(papers, args.files, args.pages)
+    run_options = dict(extract_workers=args.extract_workers, llm_workers=args.llm_workers, batch_size=args.batch_size)
+
+    if args.warm:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            reorder_all.process_pdfs(papers, papers, force=True, **run_options)
+        reorder_all.stage_timings.reset()
+        model_timings.reset()
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        reorder_all.process_pdfs(papers, papers, force=True, **run_options)
+    elapsed = time.perf_counter() - start
+
+    rss_self, rss_children = peak_rss_mb()
+    result = {
+        "benchmark": "categorize",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "config": vars(args),
+        "elapsed_s": elapsed,
+        "files_per_s": args.files / elapsed if elapsed else None,
+        "stages": reorder_all.stage_timings.summary(),
+        "model": model_timings.summary(),
+        "peak_rss_mb": rss_self,
+        "peak_rss_children_mb": rss_children,
+    }
+    with open(args.output, 'a') as file:
+        file.write(json.dumps(result) + "\n")
+
+    print(f"{args.files} files in {elapsed:.2f}s ({result['files_per_s']:.1f} files/s)")
+    if rss_self is not None:
+        print(f"peak RSS {rss_self:.1f} MB (extraction workers {rss_children:.1f} MB)")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<9} n={stats['count']:<5} p50={stats['p50'] * 1000:8.1f}ms "
+              f"p90={stats['p90'] * 1000:8.1f}ms p99={stats['p99'] * 1000:8.1f}ms")
+    print(f"Appended to {args.output}")
+
+    if args.keep:
+        print(f"Corpus kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
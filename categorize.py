@@ -0,0 +1,228 @@
+import os
+import re
+import google.generativeai as genai
+from gemini_models import get_model, timed_generate
+from rate_limit import limited_call, estimate_tokens
+
+# Configure Gemini
+genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+MODEL_NAME = "gemini-2.0-flash-thinking-exp-01-21"
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 64,
+    "max_output_tokens": 65536,
+    "response_mime_type": "text/plain",
+    }
+
+def get_existing_categories(output_base):
+    """Retrieve existing category structure from output directory"""
+    existing = []
+    if not os.path.exists(output_base):
+        return existing
+    for category in os.listdir(output_base):
+        category_path = os.path.join(output_base, category)
+        if os.path.isdir(category_path):
+            existing.append(category)
+    return existing
+
+def is_valid_category(category):
+    """A category is a single path component on a single line"""
+    return bool(category) and '/' not in category and '\n' not in category
+
+def check_category(category):
+    if not is_valid_category(category):
+        raise ValueError(f"Invalid category format: {category}")
+
+def get_category_from_gemini(content, existing_categories):
+    """Get category and explanation from Gemini API with exponential backoff"""
+    model = get_model(MODEL_NAME, GENERATION_CONFIG)
+    existing_list = "\n- ".join(existing_categories) or "None"
+    
+    prompt = f"""Read Carefuly this document looking for the most restrictive main object or area of study.
+Propose a category for it.
+Existing categories:
+- {existing_list}
+
+Guidelines:
+1. Use existing categories if VEEEEERY similar.
+2. If creating new, make it DISTINCT from existing
+3. Use a SINGLE category name
+4. Consider the document's primary focus
+5. Keep explanations brief (10-20 words)
+
+tip: use keywords if available
+
+Example Categories:
+- Consciousness (prioritize this)
+- Reasoning (prioritize this)
+- Psychology
+- NLP
+- Neuroscience
+
+Document content (first 3 pages):
+{content[:15000]}
+
+Respond EXACTLY in this format:
+
+Long explanation of categorization reason, with a step by step reasoning about it
+(Example of long explanation:
+- The document discusses the nature of consciousness, including its definition, types, and implications. It also explores the relationship between consciousness and the brain, and the philosophical debates surrounding it. Therefore, it falls under the category of Consciousness.)
+- It uses LLM to explain details about some cognitive archutectures
+- Some Computational models are described so it can be Computer Science
+After all the considerations, the model mainly falls in Consciousness category
+)
+<answer>CategoryName</answer>"""
+
+    response_text = generate_with_backoff(model, prompt)
+
+    # Extract explanation and category using regex
+    match = re.search(
+        r'(.*?)<answer>(.*?)</answer>',
+        response_text,
+        re.DOTALL
+    )
+
+    if not match:
+        raise ValueError(f"Invalid response format: {response_text}")
+
+    explanation = match.group(1).strip()
+    category = match.group(2).strip()
+
+    check_category(category)
+
+    return category, explanation
+
+def get_categories_from_gemini_batch(contents, existing_categories, max_chars_per_document=15000):
+    """Categorize several documents with a single Gemini request
+
+    Returns one (category, explanation) tuple per document, or None for every
+    document whose answer is missing or malformed so the caller can retry it
+    on its own with get_category_from_gemini.
+    """
+    model = get_model(MODEL_NAME, GENERATION_CONFIG)
+    existing_list = "\n- ".join(existing_categories) or "None"
+    documents = "\n\n".join(
+        f'<document id="{i}">\n{content[:max_chars_per_document]}\n</document>'
+        for i, content in enumerate(contents, 1)
+    )
+
+    prompt = f"""Read Carefuly each of the following {len(contents)} documents looking for the most restrictive main object or area of study.
+Propose a category for each of them.
+Existing categories:
+- {existing_list}
+
+Guidelines:
+1. Use existing categories if VEEEEERY similar.
+2. If creating new, make it DISTINCT from existing
+3. Use a SINGLE category name
+4. Consider the document's primary focus
+5. Keep explanations brief (10-20 words)
+6. Categorize every document independently, but reuse a category you created for an earlier document of this list if it fits
+
+tip: use keywords if available
+
+Example Categories:
+- Consciousness (prioritize this)
+- Reasoning (prioritize this)
+- Psychology
+- NLP
+- Neuroscience
+
+Documents (first pages of each):
+{documents}
+
+Respond EXACTLY in this format, once per document and using the same id as the document:
+
+<explanation id="1">Step by step explanation of the categorization reason of document 1</explanation>
+<answer id="1">CategoryName</answer>
+<explanation id="2">Step by step explanation of the categorization reason of document 2</explanation>
+<answer id="2">CategoryName</answer>
+(continue for every document...)"""
+
+    response_text = generate_with_backoff(model, prompt)
+
+    explanations = {
+        int(doc_id): text.strip()
+        for doc_id, text in re.findall(r'<explanation id="(\d+)">(.*?)</explanation>', response_text, re.DOTALL)
+    }
+    results = [None] * len(contents)
+    for doc_id, category in re.findall(r'<answer id="(\d+)">(.*?)</answer>', response_text, re.DOTALL):
+        index = int(doc_id) - 1
+        category = category.strip()
+        # Validate id and category format, leaving malformed answers as None
+        if not 0 <= index < len(contents) or not is_valid_category(category):
+            continue
+        results[index] = (category, explanations.get(int(doc_id), ""))
+    return results
+
+def generate_with_backoff(model, prompt):
+    """Return the response text of a Gemini request made through the shared rate limiter"""
+    response = limited_call(timed_generate, model, prompt, estimated_tokens=estimate_tokens(prompt))
+    return response.text.strip()
+
+def get_title_and_category_from_gemini(content, existing_categories):
+    """Get title, category and explanation of a document from Gemini"""
+    model = get_model(MODEL_NAME, GENERATION_CONFIG)
+    existing_list = "\n- ".join(existing_categories) or "None"
+
+    prompt = f"""Read Carefuly this document looking for the most restrictive main object or area of study.
+Also, extract verbatim the title of the document.
+
+Propose a category for the document and explain your reasoning.
+Existing categories:
+- {existing_list}
+
+Guidelines:
+1. Use existing categories if VEEEEERY similar.
+2. If creating new, make it DISTINCT from existing
+3. Use a SINGLE category name
+4. Consider the document's primary focus
+5. Keep explanations brief (10-20 words)
+
+tip: use keywords if available
+
+Example Categories:
+- Consciousness (prioritize this)
+- Reasoning (prioritize this)
+- Psychology
+- NLP
+- Neuroscience
+
+Document content (first 3 pages):
+{content[:15000]}
+
+Respond EXACTLY in this XML-like format:
+
+<title>Extracted Title of the Document</title>
+
+Explanation of categorization reason, with a step by step reasoning about it
+(Example of long explanation:
+- The document discusses the nature of consciousness, including its definition, types, and implications. It also explores the relationship between consciousness and the brain, and the philosophical debates surrounding it. Therefore, it falls under the category of Consciousness.)
+- It uses LLM to explain details about some cognitive archutectures
+- Some Computational models are described so it can be Computer Science
+After all the considerations, the model mainly falls in Consciousness category
+)
+
+<category>CategoryName</category>"""
+
+    response_text = generate_with_backoff(model, prompt)
+
+    # Extract title, explanation and category using regex
+    match = re.search(
+        r'<title>(.*?)</title>(.*?)<category>(.*?)</category>',
+        response_text,
+        re.DOTALL
+    )
+
+    if not match:
+        raise ValueError(f"Invalid response format: {response_text}")
+
+    title = match.group(1).strip()
+    explanation = match.group(2).strip()
+    category = match.group(3).strip()
+
+    check_category(category)
+
+    return title, category, explanation
+
@@ -0,0 +1,92 @@
+import os
+import re
+from rate_limit import estimate_tokens
+from result_context import RESULTS_HEADER
+
+# Token budget for the chat history carried into every request
+DEFAULT_HISTORY_TOKENS = int(os.environ.get('PAPERS_HISTORY_TOKENS', 16000))
+# Messages at the end of the history that are always kept verbatim
+DEFAULT_KEEP_RECENT = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_REPLY = "Understood, I will keep the earlier conversation in mind."
+RESULT_ENTRY = re.compile(r"- ####'(.*?)':\n##### arXiv: (\S+)")
+
+def message_text(content):
+    """Text of a history entry (a dict or a Content proto), or None if it has non-text parts"""
+    parts = content["parts"] if isinstance(content, dict) else content.parts
+    texts = [part if isinstance(part, str) else getattr(part, "text", None) or None for part in parts]
+    if any(text is None for text in texts):
+        return None
+    return "".join(texts)
+
+def message_role(content):
+    return content["role"] if isinstance(content, dict) else content.role
+
+def one_line(text, max_chars=160):
+    line = " ".join(text.split())
+    return line if len(line) <= max_chars else line[:max_chars].rsplit(" ", 1)[0] + "..."
+
+def compact_results_message(text):
+    """Replace a results block by one reference line per paper: arXiv id and title"""
+    if RESULTS_HEADER not in text:
+        return text
+    intro, results = text.split(RESULTS_HEADER, 1)
+    references = [f"- arXiv:{paper_id} {title}" for title, paper_id in RESULT_ENTRY.findall(results)]
+    return f"{one_line(intro)}\n(Earlier results, abstracts omitted)\n" + "\n".join(references)
+
+def summary_line(role, text):
+    """One summary line per folded message; results keep their arXiv ids"""
+    paper_ids = re.findall(r"^- arXiv:(\S+)", compact_results_message(text), re.MULTILINE)
+    if paper_ids:
+        return f"{role}: search results " + " ".join(f"arXiv:{paper_id}" for paper_id in paper_ids)
+    return f"{role}: {one_line(text)}"
+
+def compact_chat_history(chat, max_tokens=DEFAULT_HISTORY_TOKENS, keep_recent=DEFAULT_KEEP_RECENT):
+    """Keep chat.history within about max_tokens
+
+    Search-result dumps older than the last keep_recent messages are reduced
+    to arXiv id references. While the history is still over budget, the
+    oldest user/model pairs are folded into a running summary at the head
+    of the history, one line per message, so each turn only folds the
+    messages that newly fell out of the budget.
+    """
+    history = list(chat.history)
+    entries = [(message_role(content), message_text(content), content) for content in history]
+
+    summary_lines = []
+    if len(entries) >= 2 and entries[0][1] and entries[0][1].startswith(SUMMARY_PREFIX):
+        summary_lines = entries[0][1][len(SUMMARY_PREFIX):].splitlines()
+        entries = entries[2:]
+
+    recent_start = max(0, len(entries) - keep_recent)
+    changed = False
+    for i in range(recent_start):
+        role, text, _ = entries[i]
+        if role == "user" and text and RESULTS_HEADER in text:
+            entries[i] = (role, compact_results_message(text), None)
+            changed = True
+
+    def total_tokens():
+        summary = sum(estimate_tokens(line) for line in summary_lines)
+        return summary + sum(estimate_tokens(text) for _, text, _ in entries if text)
+
+    folded = 0
+    while total_tokens() > max_tokens and folded + 2 <= recent_start:
+        pair = entries[folded:folded + 2]
+        if any(text is None for _, text, _ in pair):
+            break
+        summary_lines.extend(summary_line(role, text) for role, text, _ in pair)
+        folded += 2
+    # The summary itself stays within half of the budget; its oldest lines go first
+    while summary_lines and sum(estimate_tokens(line) for line in summary_lines) > max_tokens // 2:
+        summary_lines.pop(0)
+
+    if not changed and not folded:
+        return
+    compacted = []
+    if summary_lines:
+        compacted.append({"role": "user", "parts": [SUMMARY_PREFIX + "\n".join(summary_lines)]})
+        compacted.append({"role": "model", "parts": [SUMMARY_REPLY]})
+    for role, text, content in entries[folded:]:
+        compacted.append(content if content is not None else {"role": role, "parts": [text]})
+    chat.history = compacted
@@ -0,0 +1,41 @@
+import threading
+from backends import get_llm_backend
+from timings import StageTimings
+
+# Model construction versus request time, to show the per-call overhead saved by reuse
+timings = StageTimings(["construction", "request"])
+
+_models = {}
+_models_lock = threading.Lock()
+
+def _model_key(backend, model_name, generation_config, system_instruction):
+    return backend, model_name, tuple(sorted(generation_config.items())), system_instruction
+
+def get_model(model_name, generation_config, system_instruction=None):
+    """Return the shared GenerativeModel for this configuration, creating it on first use
+
+    The model keeps the gRPC client it opens on its first request, so reusing
+    it across calls also reuses the connection to the backend.
+    """
+    backend = get_llm_backend()
+    key = _model_key(backend, model_name, generation_config, system_instruction)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            with timings.measure("construction"):
+                model = backend.create_model(
+                    model_name=model_name,
+                    generation_config=dict(generation_config),
+                    system_instruction=system_instruction,
+                )
+            _models[key] = model
+    return model
+
+def timed_generate(model, prompt):
+    """model.generate_content(prompt), recording the request duration"""
+    with timings.measure("request"):
+        return model.generate_content(prompt)
+
+def print_timings():
+    """Print how long was spent building models versus waiting on requests"""
+    timings.print_summary()
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from text_cache import file_sha256
+
+DEFAULT_MANIFEST_PATH = os.environ.get(
+    'PAPERS_MANIFEST',
+    os.path.join(os.getcwd(), '.papers_cache', 'categorization_manifest.sqlite3'),
+)
+
+class CategorizationManifest:
+    """Record of every PDF already categorized, so later runs can skip it.
+
+    Entries are keyed by absolute path and store size, mtime and content hash
+    together with the category, explanation, model name and timestamp. A file
+    is current when its size and mtime are unchanged, or, failing that, when
+    its content hash still matches the recorded one.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                digest TEXT NOT NULL,
+                category TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            )""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, pdf_path):
+        """Return the manifest entry for pdf_path as a dict, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM manifest WHERE path = ?", (os.path.abspath(pdf_path),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def is_current(self, pdf_path):
+        """True if pdf_path was categorized before and has not changed since"""
+        entry = self.lookup(pdf_path)
+        if entry is None:
+            return False
+        stat = os.stat(pdf_path)
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return True
+
+        # Touched but maybe not modified: fall back to the content hash
+        if file_sha256(pdf_path) != entry['digest']:
+            return False
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE manifest SET size = ?, mtime = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime, entry['path']),
+            )
+        return True
+
+    def record(self, pdf_path, category, explanation, model_name, previous_path=None, digest=None):
+        """Store the categorization of pdf_path, dropping the entry of previous_path
+
+        Pass digest when the content was already hashed (e.g. for the text
+        cache) so the file is not read again.
+        """
+        pdf_path = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        digest = digest or file_sha256(pdf_path)
+        with self._connect() as conn:
+            if previous_path:
+                conn.execute("DELETE FROM manifest WHERE path = ?", (os.path.abspath(previous_path),))
+            conn.execute(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pdf_path, stat.st_size, stat.st_mtime, digest, category,
+                 explanation, model_name, time.time()),
+            )
@@ -0,0 +1,244 @@
+import re
+from arxiv_search import iter_concurrent_results
+from backends import get_llm_backend, get_search_backend
+from chat_history import compact_chat_history
+from paper_store import arxiv_id
+from rate_limit import limited_send_message
+from result_context import build_result_context, relevant_pages
+from title_index import TitleIndex
+
+MODEL_NAME = "gemini-2.0-flash-lite-preview-02-05"
+GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 64,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+    }
+QUERY_PATTERN = re.compile(r"<query>(.*?)</query>", re.DOTALL)
+
+SYSTEM_PROMPT = """You are a query creator, reviewer, and answer generator model, you can create arxiv queries using the basic syntax
+Here are some prefixes to indicate the queried field:
+- ti -> Title
+- au -> Author
+- abs -> Abstract
+- co -> Comment
+- jr -> Journal Reference
+- cat -> Subject Category
+- rn -> Report Number
+- id -> Id (use id_list instead)
+- all -> All of the above
+
+some logical operations:
+- AND
+- OR
+- ANDNOT
+The ANDNOT Boolean operator is particularly useful, as it allows us to filter search results based on certain fields. For example, if we wanted all of the articles by the author Adrian DelMaestro with titles that did not contain the word checkerboard, we could construct the following query:
+
+<query>au:del_maestro ANDNOT ti:checkerboard</query>
+
+and agrupation terms like:
+- ( )Used to group Boolean expressions for Boolean operator precedence.
+- double quotes	Used to group multiple words into phrases to search a particular field.
+- space	Used to extend a search_query to include multiple fields.
+
+example: <query>ti:(reasoning AND llm)</query>
+always use the <query></query> and provide multiple queries if needed.
+
+When asked for QUERY you must propose the queries inside <query></query> tags.
+When asked for an ANSWER, you must state a criteria for selecting the papers, then select from the papers the most relevant ones and provide an answer to the user encapsulating the titles of the papers in <paper>TITLE</paper> tags.
+Consider that the <paper></paper> tags will be replaced by a CARD, so put it as an independent line, only containing the tags and title.
+For example:
+<paper>TITLE</paper>
+I would like the final answer to have the following structure:
+1. Think step by step to state the selection criteria for the most relevant papers (consider if it has a journal reference and it is relevant).
+2. Use that criteria and introduce, evaluating the fit to the criteria, the most relevant papers, one by one:
+For example:
+I selected the following papers because [explanation]
+
+<paper>TITLE</paper>
+
+<paper>TITLE</paper>
+
+(continue...)
+
+I also considered those relevant because [explanation]
+
+<paper>TITLE</paper>
+
+<paper>TITLE</paper>
+
+"""
+
+# For answers whose papers are tagged <paper-card> instead of <paper>
+CARD_SYSTEM_PROMPT = """You are a query creator, reviewer, and answer generator model.
+You can create ArXiv queries using the following syntax:
+- ti -> Title
+- au -> Author
+- abs -> Abstract
+- co -> Comment
+- jr -> Journal Reference
+- cat -> Subject Category
+- rn -> Report Number
+- id -> Id (use id_list instead)
+- all -> All of the above
+
+Boolean operations: AND, OR, ANDNOT
+
+Always use <query></query> tags for queries.
+When generating an ANSWER, explain your selection criteria and list paper titles within <paper-card>TITLE</paper-card> tags on isolated plain text lines (do not use triple backticks or markdown code blocks). Order the papers by relevance."""
+
+def query_prompt(prompt):
+    return f"generate a QUERY or QUERIES for the user prompt (remember the use of <query></query>):\n'{prompt}'\n\n (If the user only asks for clarification you can just use the responses from the previous queries)"
+
+def answer_prompt(result_context, found):
+    """Prompt asking for the final answer over the results block, with <paper> tags for the cards"""
+    if found:
+        return f"These are the results to the queries:\n{result_context}\nUse them to generate an ANSWER (Remember to include the <paper>TITLE</paper> tags for each answer, and state them in isolated lines (as they will be converted to cards with the info))."
+    return "The user probably only asked for clarification, check for it. (Remember to include the <paper>TITLE</paper> tags for each answer)."
+
+def extract_queries(text):
+    return [query.strip() for query in QUERY_PATTERN.findall(text) if query.strip()]
+
+def tag_pattern(tag):
+    return re.compile(f"<{tag}>(.*?)</{tag}>")
+
+def paper_card(result):
+    """HTML card of a result, as shown in place of a <paper> tag
+
+    Its lines are not indented, so markdown never takes them for a code block.
+    """
+    authors = ", ".join([author.name for author in result.authors])
+    categories = ", ".join(result.categories)
+    journal_ref = f"\n<p><b>Journal Reference:</b> {result.journal_ref}</p>" if result.journal_ref else ""
+    return f"""
+<div style="border: 1px solid #e6e9ef; border-radius: 5px; padding: 10px; margin-bottom: 10px;">
+<h4><a href="{result.links[0].href}" target="_blank">{result.title}</a> <a href="{result.pdf_url}" target="_blank">[PDF]</a></h4>
+<p><b>Authors:</b> {authors}</p>
+<p><b>Categories:</b> {categories}</p>{journal_ref}
+<p><b>Date:</b> {result.published}</p>
+<p>{result.summary}</p>
+</div>"""
+
+class PaperLibrary:
+    """Papers found during a conversation, by arXiv id, with their titles indexed for lookup"""
+
+    def __init__(self):
+        self.results = {}
+        self.titles = TitleIndex()
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, paper_id):
+        return self.results.get(paper_id)
+
+    def add(self, result):
+        """Add a result, keeping the newest version of each paper; returns its arXiv id"""
+        paper_id = arxiv_id(result)
+        known = self.results.get(paper_id)
+        if known is None or result.updated >= known.updated:
+            self.results[paper_id] = result
+            self.titles.add(paper_id, result.title)
+        return paper_id
+
+    def resolve(self, title, max_distance=5):
+        """arXiv id of the paper whose title is within max_distance edits of title, or None"""
+        return self.titles.resolve(title, max_distance=max_distance)
+
+    def clear(self):
+        self.results.clear()
+        self.titles.clear()
+
+def card_replacer(library, render=paper_card, missing="\n[NOT FOUND]\n"):
+    """Replacement function for StreamingTagRenderer: a tag's title becomes the card of its paper"""
+    def replace(match):
+        result = library.get(library.resolve(match.group(1)))
+        if not result:
+            return missing
+        return render(result)
+    return replace
+
+def create_model(api_key=None, system_instruction=SYSTEM_PROMPT, model_name=MODEL_NAME,
+                 generation_config=GENERATION_CONFIG):
+    """Model handle on the current LLM backend, outside of Streamlit; start one chat per conversation on it"""
+    return get_llm_backend().create_model(
+        model_name=model_name,
+        generation_config=dict(generation_config),
+        system_instruction=system_instruction,
+        api_key=api_key,
+    )
+
+class ResearchAssistant:
+    """The query -> arXiv search -> answer loop of the arXiv apps, without any UI
+
+    Each step is a generator so a front end can render the model's text and
+    the results as they arrive; ask() runs a whole turn headless. Papers
+    found along the way are kept in library, which resolves the titles the
+    model cites back to arXiv ids.
+    """
+
+    def __init__(self, chat, library=None, client_pool=None, client_factory=None, tag="paper",
+                 answer_prompt=answer_prompt):
+        self.chat = chat
+        self.library = library if library is not None else PaperLibrary()
+        self.client_pool = client_pool
+        self.client_factory = client_factory
+        self.tag = tag
+        self.answer_prompt = answer_prompt
+
+    def _stream(self, content):
+        for chunk in limited_send_message(self.chat, content, stream=True):
+            yield chunk.text
+
+    def stream_queries(self, prompt):
+        """Text of the model's reply with the arXiv queries for prompt, chunk by chunk"""
+        return self._stream(query_prompt(prompt))
+
+    def search(self, queries, prompt):
+        """Run queries concurrently, yielding (query, result, error) and adding every result to the library"""
+        client_factory = self.client_factory or get_search_backend().create_client
+        for query, result, error in iter_concurrent_results(queries, client_factory,
+                                                            client_pool=self.client_pool,
+                                                            wants_more=relevant_pages(prompt)):
+            if result is not None:
+                self.library.add(result)
+            yield query, result, error
+
+    def stream_answer(self, prompt, results):
+        """Text of the final answer over results, chunk by chunk, with the paper tags left in"""
+        result_context = build_result_context(results, prompt)
+        return self._stream(self.answer_prompt(result_context, bool(results)))
+
+    def cited_papers(self, answer):
+        """(arXiv ids, unresolved titles) of the papers tagged in answer, in order of first mention"""
+        paper_ids, unresolved = [], []
+        for title in tag_pattern(self.tag).findall(answer):
+            paper_id = self.library.resolve(title)
+            if paper_id is None:
+                unresolved.append(title)
+            elif paper_id not in paper_ids:
+                paper_ids.append(paper_id)
+        return paper_ids, unresolved
+
+    def ask(self, prompt):
+        """Run one full turn for prompt and return its queries, answer and cited arXiv ids"""
+        queries = extract_queries("".join(self.stream_queries(prompt)))
+        results, errors = [], {}
+        for query, result, error in self.search(queries, prompt):
+            if error:
+                errors[query] = str(error)
+            else:
+                results.append(result)
+        answer = "".join(self.stream_answer(prompt, results))
+        compact_chat_history(self.chat)
+        paper_ids, unresolved = self.cited_papers(answer)
+        return {
+            "prompt": prompt,
+            "queries": queries,
+            "found": len(results),
+            "answer": answer,
+            "paper_ids": paper_ids,
+            "unresolved_titles": unresolved,
+            "errors": errors,
+        }
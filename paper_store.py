@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import arxiv
+from arxiv_cache import result_to_dict, result_from_dict
+
+DEFAULT_STORE_PATH = os.environ.get(
+    'PAPERS_STORE',
+    os.path.join(os.getcwd(), '.papers_cache', 'papers.sqlite3'),
+)
+# A local answer needs at least this many matches before the live API is skipped
+DEFAULT_MIN_LOCAL_HITS = int(os.environ.get('PAPERS_STORE_MIN_HITS', 25))
+
+# arXiv search fields and the full-text columns they map to; None searches every column
+FIELD_COLUMNS = {"ti": "title", "abs": "summary", "au": "authors", "all": None}
+QUERY_TOKEN = re.compile(
+    r'\s*(?:(?P<open>\()|(?P<close>\))|(?P<op>ANDNOT|AND|OR)(?=[\s()]|$)'
+    r'|(?P<field>[a-z_]+):|"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))'
+)
+
+def arxiv_id(result):
+    """arXiv id of a result without its version suffix, e.g. 2001.03018"""
+    return re.sub(r"v\d+$", "", result.get_short_id())
+
+def to_fts_query(query):
+    """Translate an arXiv search query into an FTS5 match expression
+
+    Supports the ti:, abs:, au: and all: fields, quoted phrases, parentheses
+    and the AND, OR and ANDNOT operators. Returns None when the query uses
+    anything else, in which case only the live API can answer it.
+    """
+    parts = []
+    depth = 0
+    pending_column = None
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = QUERY_TOKEN.match(query, position)
+        if match is None or match.end() == position:
+            return None
+        position = match.end()
+        if match.group("field"):
+            if match.group("field") not in FIELD_COLUMNS or pending_column is not None:
+                return None
+            pending_column = FIELD_COLUMNS[match.group("field")] or ""
+            continue
+        column = pending_column if pending_column is not None else ""
+        pending_column = None
+        if match.group("open"):
+            depth += 1
+            parts.append(f"{column} : (" if column else "(")
+        elif match.group("close"):
+            if depth == 0:
+                return None
+            depth -= 1
+            parts.append(")")
+        elif match.group("op"):
+            if column:
+                return None
+            parts.append("NOT" if match.group("op") == "ANDNOT" else match.group("op"))
+        else:
+            term = match.group("phrase") if match.group("phrase") is not None else match.group("word")
+            if not re.search(r"\w", term):
+                return None
+            term = '"' + term.replace('"', '""') + '"'
+            parts.append(f"{column} : {term}" if column else term)
+    if pending_column is not None or depth or not parts:
+        return None
+    return " ".join(parts)
+
+class PaperStore:
+    """Persistent store of every arXiv result fetched, with a full-text index.
+
+    Papers are keyed by arXiv id without version; re-fetching a paper keeps
+    the most recently updated version. Title, abstract and authors are
+    indexed with FTS5 so translated arXiv queries can be answered locally.
+    Each paper keeps the time it was last fetched, so a search can leave out
+    papers too old to trust.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    arxiv_id TEXT PRIMARY KEY,
+                    entry_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    authors TEXT NOT NULL,
+                    published TEXT NOT NULL,
+                    updated TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    fetched REAL NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                    title, summary, authors, content='papers', content_rowid='rowid'
+                );
+                CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+                    INSERT INTO papers_fts(rowid, title, summary, authors)
+                    VALUES (new.rowid, new.title, new.summary, new.authors);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+                    INSERT INTO papers_fts(papers_fts, rowid, title, summary, authors)
+                    VALUES ('delete', old.rowid, old.title, old.summary, old.authors);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+                    INSERT INTO papers_fts(papers_fts, rowid, title, summary, authors)
+                    VALUES ('delete', old.rowid, old.title, old.summary, old.authors);
+                    INSERT INTO papers_fts(rowid, title, summary, authors)
+                    VALUES (new.rowid, new.title, new.summary, new.authors);
+                END;
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upsert(self, results):
+        """Insert or refresh results, keeping the newest version of each paper"""
+        now = time.time()
+        rows = [
+            (
+                arxiv_id(result),
+                result.entry_id,
+                result.title,
+                result.summary,
+                "; ".join(author.name for author in result.authors),
+                result.published.isoformat(),
+                result.updated.isoformat(),
+                json.dumps(result_to_dict(result)),
+                now,
+            )
+            for result in results
+        ]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                """INSERT INTO papers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(arxiv_id) DO UPDATE SET
+                    entry_id = excluded.entry_id, title = excluded.title, summary = excluded.summary,
+                    authors = excluded.authors, published = excluded.published, updated = excluded.updated,
+                    data = excluded.data, fetched = excluded.fetched
+                WHERE excluded.updated >= papers.updated""",
+                rows,
+            )
+
+    def get(self, paper_id):
+        """Stored arxiv.Result for an arXiv id (with or without version), or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM papers WHERE arxiv_id = ?", (re.sub(r"v\d+$", "", paper_id),)
+            ).fetchone()
+        return result_from_dict(json.loads(row[0])) if row else None
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def search(self, query, max_results=100, sort_by=arxiv.SortCriterion.Relevance,
+               sort_order=arxiv.SortOrder.Descending, max_age=None):
+        """Answer an arXiv query from the local index
+
+        Returns a list of arxiv.Result in the requested order, or None when
+        the query cannot be translated to the full-text index. With max_age,
+        only papers fetched less than max_age seconds ago are matched.
+        """
+        fts_query = to_fts_query(query)
+        if fts_query is None:
+            return None
+        direction = "ASC" if sort_order == arxiv.SortOrder.Ascending else "DESC"
+        if sort_by == arxiv.SortCriterion.SubmittedDate:
+            order = f"papers.published {direction}"
+        elif sort_by == arxiv.SortCriterion.LastUpdatedDate:
+            order = f"papers.updated {direction}"
+        else:
+            order = "papers_fts.rank"
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"""SELECT papers.data FROM papers_fts JOIN papers ON papers.rowid = papers_fts.rowid
+                    WHERE papers_fts MATCH ? AND papers.fetched >= ? ORDER BY {order} LIMIT ?""",
+                    (fts_query, 0 if max_age is None else time.time() - max_age,
+                     -1 if max_results is None else max_results),
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Local search failed for '{query}': {e}")
+            return None
+        return [result_from_dict(json.loads(row[0])) for row in rows]
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_paper_store():
+    """Process-wide PaperStore at DEFAULT_STORE_PATH"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PaperStore()
+        return _default_store
@@ -0,0 +1,122 @@
+import mmap
+import hashlib
+import pathlib
+from PyPDF2 import PdfReader
+
+# Only the first 15000 characters of a document ever reach the categorization prompt
+DEFAULT_MAX_CHARS = 15000
+
+class PdfDocument:
+    """A PDF opened and memory-mapped once, exposing metadata, page count and lazy page text.
+
+    The PyPDF2 reader is only built on first use, so a document whose text
+    is already cached costs no parsing unless its metadata is read.
+    """
+
+    def __init__(self, pdf_path):
+        self.path = pdf_path
+        self._file = open(pdf_path, 'rb')
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped; let PdfReader report them instead
+            self._buffer = None
+        self._reader = None
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = PdfReader(self._buffer if self._buffer is not None else self._file)
+        return self._reader
+
+    @property
+    def metadata(self):
+        return self.reader.metadata
+
+    @property
+    def title(self):
+        """Title from the PDF metadata, or None"""
+        metadata = self.metadata
+        return metadata.title if metadata and metadata.title else None
+
+    def sha256(self):
+        """Hex SHA-256 of the file's content, hashed from the mapping without another read"""
+        return hashlib.sha256(self._buffer if self._buffer is not None else self._file.read()).hexdigest()
+
+    @property
+    def page_count(self):
+        return len(self.reader.pages)
+
+    def iter_page_text(self, max_pages):
+        """Lazily yield the text of the first max_pages pages, skipping unreadable ones"""
+        for i in range(min(self.page_count, max_pages)):
+            try:
+                yield self.reader.pages[i].extract_text() or ""
+            except Exception as e:
+                print(f"Error reading page {i + 1} of {self.path}: {e}")
+
+    def extract_text(self, max_pages, max_chars=DEFAULT_MAX_CHARS):
+        """Text of the first max_pages pages, stopping once max_chars are collected"""
+        pages = []
+        collected = 0
+        for page_text in self.iter_page_text(max_pages):
+            pages.append(page_text)
+            collected += len(page_text)
+            if collected >= max_chars:
+                break
+        return "".join(pages).strip()
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def extract_text_from_pdf(pdf_path, max_pages=33, max_chars=DEFAULT_MAX_CHARS):
+    """Extract text from first n pages of a PDF, stopping once max_chars are collected"""
+    try:
+        with PdfDocument(pdf_path) as document:
+            return document.extract_text(max_pages, max_chars)
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+    return ""
+
+def extract_title_from_pdf(pdf_path):
+    """Attempt to extract title from PDF metadata, otherwise return filename"""
+    try:
+        with PdfDocument(pdf_path) as document:
+            if document.title:
+                return document.title
+    except Exception as e:
+        print(f"Error reading metadata from {pdf_path}: {e}")
+    # Fallback to using filename if metadata title is not available or error occurs
+    return pathlib.Path(pdf_path).stem  # Extract filename without extension
+
+def extract_text_and_digest(pdf_path, max_pages=13, max_chars=DEFAULT_MAX_CHARS, text_cache=None):
+    """Open a PDF once and return (text, SHA-256 of its content)
+
+    The digest is taken from the mapped file and keys text_cache when given,
+    so a cache hit reads the file once and parses nothing. The digest is
+    None when the file cannot be read.
+    """
+    text = ""
+    digest = None
+    try:
+        with PdfDocument(pdf_path) as document:
+            digest = document.sha256()
+            if text_cache is None:
+                text = document.extract_text(max_pages, max_chars)
+            else:
+                text = text_cache.get_or_extract(
+                    pdf_path,
+                    lambda _path, pages, chars: document.extract_text(pages, chars),
+                    max_pages, max_chars, digest=digest,
+                )
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+    return text, digest
@@ -0,0 +1,206 @@
+import os
+import random
+import threading
+import time
+from google.api_core import exceptions as api_exceptions
+
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit breaker is open"""
+
+def is_rate_limit_error(error):
+    return isinstance(error, (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)) \
+        or '429' in str(error)
+
+def is_retryable_error(error):
+    return isinstance(error, RETRYABLE_ERRORS) or is_rate_limit_error(error)
+
+def estimate_tokens(text):
+    """Rough token count used for tokens-per-minute accounting (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def estimate_message_tokens(chat, content):
+    """Tokens a chat.send_message(content) request carries: the whole chat history plus content"""
+    messages = [entry["parts"] if isinstance(entry, dict) else entry.parts for entry in getattr(chat, "history", [])]
+    messages.append([content] if isinstance(content, str) else content)
+    text = "".join(part if isinstance(part, str) else getattr(part, "text", "") or ""
+                   for parts in messages for part in parts)
+    return estimate_tokens(text)
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount):
+        """Take amount tokens, possibly going negative, and return how long to wait for them"""
+        # Requests larger than the bucket would never fit; let them through at a full bucket
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+class CircuitBreaker:
+    """Stops calls for reset_timeout seconds after failure_threshold consecutive failures.
+
+    Once the timeout has passed a single trial call is let through; its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=10, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(f"Circuit open after {self._failures} consecutive failures, retry in {max(remaining, 0):.0f}s")
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+class RateLimiter:
+    """Process-wide limiter for one backend: requests/min and tokens/min budgets,
+    a shared jittered exponential backoff and a circuit breaker.
+
+    When any caller hits a rate limit, every caller pauses until the shared
+    backoff expires, so concurrent workers do not retry in lockstep. At most
+    max_concurrent calls run at once; the others wait for a free slot. Pass
+    slots to share that cap with other limiters.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=5, base_delay=1, max_delay=60,
+                 circuit_breaker=None, name="Gemini", max_concurrent=8, slots=None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._slots = slots or threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self, estimated_tokens=0):
+        """Block until the shared backoff has expired and both budgets allow one more request"""
+        with self._lock:
+            pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if delay > 0:
+            time.sleep(delay)
+
+    def back_off(self, attempt):
+        """Pause every caller for a jittered exponential delay and return it"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def call(self, fn, *args, estimated_tokens=0, **kwargs):
+        """fn(*args, **kwargs) under the limiter, retrying rate limits and transient server errors"""
+        for attempt in range(self.max_retries):
+            self.circuit_breaker.before_call()
+            self.acquire(estimated_tokens)
+            try:
+                with self._slots:
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # The backend answered, so this also ends a half-open trial
+                    self.circuit_breaker.record_success()
+                    print(f"{self.name} API error: {e}")
+                    raise
+                self.circuit_breaker.record_failure()
+                delay = self.back_off(attempt)
+                print(f"Rate limit exceeded. Retrying in {delay:.1f} seconds...")
+                print(f"due to {e}")
+                continue
+            self.circuit_breaker.record_success()
+            return result
+
+        raise Exception(f"Failed after {self.max_retries} retries due to rate limiting")
+
+_limiters = {}
+_backend_slots = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(backend="gemini", api_key=None):
+    """Shared RateLimiter for a backend, configured from <BACKEND>_RPM, <BACKEND>_TPM and <BACKEND>_CONCURRENCY
+
+    Each api_key gets its own limiter, since quotas are per key; None is the
+    process-wide limiter of the single-key scripts. The concurrency cap is
+    shared by every key of the backend.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get((backend, api_key))
+        if limiter is None:
+            prefix = backend.upper()
+            slots = _backend_slots.get(backend)
+            if slots is None:
+                slots = _backend_slots[backend] = threading.BoundedSemaphore(
+                    int(os.environ.get(f"{prefix}_CONCURRENCY", 8)))
+            limiter = RateLimiter(
+                requests_per_minute=float(os.environ.get(f"{prefix}_RPM", 15)),
+                tokens_per_minute=float(os.environ.get(f"{prefix}_TPM", 1_000_000)),
+                name=backend.capitalize(),
+                slots=slots,
+            )
+            _limiters[(backend, api_key)] = limiter
+        return limiter
+
+def limited_call(fn, *args, backend="gemini", estimated_tokens=0, limiter=None, **kwargs):
+    """Call fn through limiter, or the shared limiter of backend"""
+    limiter = limiter or get_limiter(backend)
+    return limiter.call(fn, *args, estimated_tokens=estimated_tokens, **kwargs)
+
+def limited_send_message(chat, content, backend="gemini", **kwargs):
+    """chat.send_message(content, **kwargs) through the shared limiter
+
+    A model handle carrying a rate_limiter (see resource_pool.shared_model)
+    uses that one, so sessions on different API keys never share a quota.
+    With stream=True the retry and the concurrency slot only cover opening
+    the stream, which is where Gemini reports rate limits. The tokens
+    counted include the history, since every request resends it.
+    """
+    limiter = getattr(getattr(chat, "model", None), "rate_limiter", None)
+    return limited_call(chat.send_message, content, backend=backend, limiter=limiter,
+                        estimated_tokens=estimate_message_tokens(chat, content), **kwargs)
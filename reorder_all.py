@@ -1,172 +1,165 @@
 import os
-import re
+import argparse
+import itertools
+import threading
 import time
-from PyPDF2 import PdfReader
-import google.generativeai as genai
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import shutil
-
-# Configure Gemini
-genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-
-def get_existing_categories(output_base):
-    """Retrieve existing category structure from output directory"""
-    existing = []
-    if not os.path.exists(output_base):
-        return existing
-    for category in os.listdir(output_base):
-        category_path = os.path.join(output_base, category)
-        if os.path.isdir(category_path):
-            existing.append(category)
-    return existing
-
-def extract_text_from_pdf(pdf_path, max_pages=33):
-    """Extract text from first n pages of a PDF"""
-    text = ""
-    try:
-        with open(pdf_path, 'rb') as file:
-            reader = PdfReader(file)
-            for i in range(min(len(reader.pages), max_pages)):
-                page = reader.pages[i]
-                text += page.extract_text() or ""
-    except Exception as e:
-        print(f"Error reading {pdf_path}: {e}")
-    return text.strip()
-
-def get_category_from_gemini(content, existing_categories):
-    """Get category and explanation from Gemini API with exponential backoff"""
-    generation_config = {
-        "temperature": 0.7,
-        "top_p": 0.95,
-        "top_k": 64,
-        "max_output_tokens": 65536,
-        "response_mime_type": "text/plain",
-        }
-
-    model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-    )
-    existing_list = "\n- ".join(existing_categories) or "None"
-    
-    prompt = f"""Read Carefuly this document looking for the most restrictive main object or area of study.
-Propose a category for it.
-Existing categories:
-- {existing_list}
-
-Guidelines:
-1. Use existing categories if VEEEEERY similar.
-2. If creating new, make it DISTINCT from existing
-3. Use a SINGLE category name
-4. Consider the document's primary focus
-5. Keep explanations brief (10-20 words)
-
-tip: use keywords if available
-
-Example Categories:
-- Consciousness (prioritize this)
-- Reasoning (prioritize this)
-- Psychology
-- NLP
-- Neuroscience
-
-Document content (first 3 pages):
-{content[:15000]}
-
-Respond EXACTLY in this format:
-
-Long explanation of categorization reason, with a step by step reasoning about it
-(Example of long explanation:
-- The document discusses the nature of consciousness, including its definition, types, and implications. It also explores the relationship between consciousness and the brain, and the philosophical debates surrounding it. Therefore, it falls under the category of Consciousness.)
-- It uses LLM to explain details about some cognitive archutectures
-- Some Computational models are described so it can be Computer Science
-After all the considerations, the model mainly falls in Consciousness category
-)
-<answer>CategoryName</answer>"""
-
-    max_retries = 5
-    base_delay = 1  # Initial delay in seconds
-    
-    for attempt in range(max_retries):
+from text_cache import get_text_cache
+from pdf_text import extract_text_and_digest, DEFAULT_MAX_CHARS
+from manifest import CategorizationManifest
+from gemini_models import print_timings
+from timings import StageTimings
+from categorize import MODEL_NAME, get_existing_categories, get_category_from_gemini, get_categories_from_gemini_batch
+
+# Wall-clock time of each pipeline stage, per file (walk: once per run, classify: per request)
+stage_timings = StageTimings(["walk", "extract", "classify", "move"])
+
+def extract_cached_text(pdf_path, max_pages=33):
+    """(text, content hash) of a PDF through the on-disk cache so unchanged PDFs are never re-parsed"""
+    return extract_text_and_digest(pdf_path, max_pages, DEFAULT_MAX_CHARS, get_text_cache())
+
+def timed_extract(pdf_path):
+    """extract_cached_text plus its duration, measured inside the worker process"""
+    start = time.perf_counter()
+    text, digest = extract_cached_text(pdf_path)
+    return text, digest, time.perf_counter() - start
+
+def iter_extracted_texts(pool, pdf_paths, max_pending):
+    """Yield (pdf_path, text, digest) as extractions finish, keeping at most max_pending in flight"""
+    paths = iter(pdf_paths)
+    in_flight = {}
+    for pdf_path in itertools.islice(paths, max_pending):
+        in_flight[pool.submit(timed_extract, pdf_path)] = pdf_path
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            pdf_path = in_flight.pop(future)
+            # Refill the freed slot before handing the result downstream
+            for next_path in itertools.islice(paths, 1):
+                in_flight[pool.submit(timed_extract, next_path)] = next_path
+            text, digest, seconds = future.result()
+            stage_timings.record("extract", seconds)
+            yield pdf_path, text, digest
+
+def move_to_category(pdf_path, category, explanation, output_base, existing_categories, categories_lock, manifest,
+                     digest=None):
+    """Move a categorized PDF into its category folder and record it under its content hash digest"""
+    filename = os.path.basename(pdf_path)
+
+    # Create target directory
+    target_dir = os.path.join(output_base, category)
+    os.makedirs(target_dir, exist_ok=True)
+
+    # Copy PDF with original name
+    target_path = os.path.join(target_dir, filename)
+    shutil.move(pdf_path, target_path)
+    manifest.record(target_path, category, explanation, MODEL_NAME, previous_path=pdf_path, digest=digest)
+
+    # Update existing categories list
+    with categories_lock:
+        if category not in existing_categories:
+            existing_categories.append(category)
+
+    # Single print call so concurrent reports do not interleave
+    print("\n".join([
+        "="*53,
+        f"PROCESSED: {filename} -> {target_dir}",
+        f"EXPLANATION:\n{explanation}",
+        f"CATEGORY: {category}",
+        "="*53,
+    ]), "\n")
+
+def categorize_and_move(batch, output_base, existing_categories, categories_lock, manifest):
+    """Classify a batch of (pdf_path, text, digest) entries and move each PDF into its category folder"""
+    # Snapshot so the prompt sees every category created by earlier workers
+    with categories_lock:
+        known_categories = list(existing_categories)
+
+    results = [None] * len(batch)
+    if len(batch) > 1:
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract explanation and category using regex
-            match = re.search(
-                r'(.*?)<answer>(.*?)</answer>',
-                response_text,
-                re.DOTALL
-            )
-            
-            if not match:
-                raise ValueError(f"Invalid response format: {response_text}")
-                
-            explanation = match.group(1).strip()
-            category = match.group(2).strip()
-            
-            # Validate category format
-            if '/' in category or '\n' in category:
-                raise ValueError(f"Invalid category format: {category}")
-                
-            return category, explanation
-            
+            with stage_timings.measure("classify"):
+                results = get_categories_from_gemini_batch([text for _, text, _ in batch], known_categories)
         except Exception as e:
-            if '429' in str(e):  # Rate limit error detection
-                delay = base_delay * (2 ** attempt)
-                print(f"Rate limit exceeded. Retrying in {delay} seconds...")
-                print(f"due to {e}")
-                time.sleep(delay)
-            else:
-                print(f"Gemini API error: {e}")
-                raise
-                
-    raise Exception(f"Failed after {max_retries} retries due to rate limiting")
-
-def process_pdfs(input_folder, output_base):
-    """Main processing function"""
-    existing_categories = get_existing_categories(output_base)
-    all_files = []
-    folder_path = input_folder
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            file_path = os.path.join(root,file)
-            all_files.append(file_path)
-
-    for pdf_path in all_files:
-        filename = os.path.basename(pdf_path) 
-        
-        if not filename.lower().endswith('.pdf'):
-            continue
-        
-        text = extract_text_from_pdf(pdf_path)
-        
-        if not text:
-            print(f"Skipping {filename} - no text extracted")
-            continue
-            
+            print(f"Batch of {len(batch)} failed, falling back to single requests: {e}")
+
+    for (pdf_path, text, digest), result in zip(batch, results):
+        filename = os.path.basename(pdf_path)
         try:
-            category, explanation = get_category_from_gemini(text, existing_categories)
-            
-            # Create target directory
-            target_dir = os.path.join(output_base, category)
-            os.makedirs(target_dir, exist_ok=True)
-            
-            # Copy PDF with original name
-            shutil.move(pdf_path, os.path.join(target_dir, filename))
-            
-            # Update existing categories list
-            if category not in existing_categories:
-                existing_categories.append(category)
-                
-            print("="*53)
-            print(f"PROCESSED: {filename} -> {target_dir}")
-            print(f"EXPLANATION:\n{explanation}")
-            print(f"CATEGORY: {category}")
-            print("="*53,"\n")
-            
+            if result is None:
+                with categories_lock:
+                    known_categories = list(existing_categories)
+                with stage_timings.measure("classify"):
+                    result = get_category_from_gemini(text, known_categories)
+            category, explanation = result
+            with stage_timings.measure("move"):
+                move_to_category(pdf_path, category, explanation, output_base,
+                                 existing_categories, categories_lock, manifest, digest)
+
         except Exception as e:
             print(f"Failed to process {filename}: {e}")
 
+def process_pdfs(input_folder, output_base, extract_workers=None, llm_workers=4, max_pending=None,
+                 force=False, manifest=None, batch_size=1):
+    """Main processing function
+
+    PDF parsing runs in a process pool (extract_workers, defaults to the CPU
+    count) and feeds a thread pool of llm_workers Gemini calls. At most
+    max_pending files (default 2 * llm_workers) wait in each stage, so a slow
+    API throttles extraction instead of piling up extracted text in memory.
+
+    Files already recorded in the manifest and unchanged since are skipped
+    unless force is set. With batch_size > 1, each Gemini request categorizes
+    that many documents at once.
+    """
+    existing_categories = get_existing_categories(output_base)
+    categories_lock = threading.Lock()
+    max_pending = max_pending or 2 * llm_workers
+    manifest = manifest or CategorizationManifest()
+
+    with stage_timings.measure("walk"):
+        all_files = []
+        folder_path = input_folder
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                file_path = os.path.join(root,file)
+                all_files.append(file_path)
+        pdf_paths = [path for path in all_files if path.lower().endswith('.pdf')]
+        if not force:
+            pdf_paths = [path for path in pdf_paths if not manifest.is_current(path)]
+            print(f"{len(pdf_paths)} new or changed PDFs to categorize")
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+        pending = set()
+        batch = []
+        for pdf_path, text, digest in iter_extracted_texts(extract_pool, pdf_paths, max_pending * batch_size):
+            if not text:
+                print(f"Skipping {os.path.basename(pdf_path)} - no text extracted")
+                continue
+            batch.append((pdf_path, text, digest))
+            if len(batch) < batch_size:
+                continue
+
+            # Backpressure: wait for a Gemini slot before taking more text
+            if len(pending) >= max_pending:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            pending.add(llm_pool.submit(
+                categorize_and_move, batch, output_base,
+                existing_categories, categories_lock, manifest,
+            ))
+            batch = []
+
+        if batch:
+            pending.add(llm_pool.submit(
+                categorize_and_move, batch, output_base,
+                existing_categories, categories_lock, manifest,
+            ))
+        wait(pending)
+
 def delete_empty_subfolders(root_folder):
     """
     Recursively deletes empty subfolders within the specified root folder.
@@ -207,15 +200,25 @@ def delete_empty_subfolders(root_folder):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Reorganize the papers folder by content using AI categorization')
+    parser.add_argument('--extract-workers', type=int, default=None, help='Processes used for PDF text extraction (default: CPU count)')
+    parser.add_argument('--llm-workers', type=int, default=4, help='Concurrent Gemini categorization requests')
+    parser.add_argument('--max-pending', type=int, default=None, help='Files allowed to queue between stages (default: 2 * llm-workers)')
+    parser.add_argument('--force', action='store_true', help='Re-categorize every PDF, ignoring the manifest')
+    parser.add_argument('--batch-size', type=int, default=1, help='Documents categorized per Gemini request')
+    args = parser.parse_args()
 
     input_folder = os.path.join(os.getcwd(), 'papers')
     output_folder = os.path.join(os.getcwd(), 'papers')
     print(f"Processing PDFs from {input_folder}")
     print(f"Output directory: {output_folder}")
     
-    process_pdfs(input_folder, output_folder)
+    process_pdfs(input_folder, output_folder, args.extract_workers, args.llm_workers, args.max_pending,
+                 args.force, batch_size=args.batch_size)
 
     delete_empty_subfolders(output_folder)
+    stage_timings.print_summary()
+    print_timings()
     
 if __name__ == '__main__':
     main()
\ No newline at end of file
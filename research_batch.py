@@ -0,0 +1,102 @@
+"""Headless batch mode of the arXiv research assistant.
+
+Reads one JSON object per line with a "prompt" (or --prompt-field) and an
+optional "id", runs each prompt through the query -> arXiv search ->
+answer loop with its own chat, and appends one JSON line per prompt to the
+output file: queries, answer, cited arXiv ids and errors. Prompts whose id
+is already in the output are skipped, so an interrupted run can resume.
+
+    python research_batch.py prompts.jsonl answers.jsonl --workers 8
+"""
+import os
+import json
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from arxiv_search import ClientPool, DEFAULT_PAGE_SIZE
+from backends import get_search_backend
+from paper_assistant import ResearchAssistant, create_model
+
+def read_prompts(path, prompt_field="prompt"):
+    """(id, prompt) of every line of a JSONL file; the id defaults to "id", "request_id" or the line number"""
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            prompt = item.get(prompt_field)
+            if not prompt:
+                print(f"Skipping line {line_number}: no '{prompt_field}' field")
+                continue
+            prompt_id = item.get("id", item.get("request_id", line_number))
+            prompts.append((str(prompt_id), prompt))
+    return prompts
+
+def read_done_ids(path):
+    """Ids already answered in an existing output file"""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if not item.get("failed"):
+                done.add(str(item["id"]))
+    return done
+
+def answer_prompt(prompt_id, prompt, model, client_pool):
+    """Run one prompt with a fresh chat on model and return its output record"""
+    start = time.perf_counter()
+    try:
+        assistant = ResearchAssistant(model.start_chat(history=[]), client_pool=client_pool)
+        record = {"id": prompt_id, **assistant.ask(prompt)}
+    except Exception as e:
+        record = {"id": prompt_id, "prompt": prompt, "failed": True, "error": str(e)}
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+def run_batch(input_path, output_path, workers=4, arxiv_clients=4, prompt_field="prompt", api_key=None):
+    """Answer every prompt of input_path not yet in output_path, workers prompts at a time"""
+    prompts = read_prompts(input_path, prompt_field)
+    done = read_done_ids(output_path)
+    pending = [(prompt_id, prompt) for prompt_id, prompt in prompts if prompt_id not in done]
+    print(f"{len(prompts)} prompts, {len(prompts) - len(pending)} already answered, {len(pending)} to run")
+    if not pending:
+        return
+
+    # One model handle for every prompt, so they share its client and connections
+    model = create_model(api_key=api_key)
+    # One pool for every prompt, so concurrent searches share clients and politeness delays
+    backend = get_search_backend()
+    client_pool = ClientPool(lambda: backend.create_client(page_size=DEFAULT_PAGE_SIZE), arxiv_clients)
+    failed = 0
+    with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(answer_prompt, prompt_id, prompt, model, client_pool) for prompt_id, prompt in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            failed += bool(record.get("failed"))
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            status = "FAILED" if record.get("failed") else f"{len(record['paper_ids'])} papers"
+            print(f"[{finished}/{len(pending)}] {record['id']}: {status} in {record['seconds']:.1f}s")
+    print(f"Done: {len(pending) - failed} answered, {failed} failed")
+
+def main():
+    parser = argparse.ArgumentParser(description='Answer literature questions from a JSONL file with the arXiv research assistant')
+    parser.add_argument('input', help='JSONL file with one prompt per line')
+    parser.add_argument('output', help='JSONL file the answers are appended to')
+    parser.add_argument('--workers', type=int, default=4, help='Prompts processed concurrently')
+    parser.add_argument('--arxiv-clients', type=int, default=4, help='arXiv requests allowed in flight at once')
+    parser.add_argument('--prompt-field', default='prompt', help='Field of each input line holding the prompt')
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, args.workers, args.arxiv_clients, args.prompt_field,
+              api_key=os.environ.get('GEMINI_API_KEY'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import streamlit as st
+from arxiv_search import ClientPool, DEFAULT_PAGE_SIZE
+from backends import get_llm_backend, get_search_backend
+from rate_limit import get_limiter
+
+# arXiv clients shared by every session of the server process, one request in flight each
+ARXIV_POOL_SIZE = int(os.environ.get('PAPERS_ARXIV_POOL_SIZE', 4))
+# Distinct (API key, model config) handles kept alive; the least recently used go first
+MAX_CACHED_MODELS = int(os.environ.get('PAPERS_MAX_CACHED_MODELS', 64))
+
+@st.cache_resource(max_entries=MAX_CACHED_MODELS, show_spinner=False)
+def _cached_model(backend_name, api_key, model_name, generation_config, system_instruction):
+    model = get_llm_backend().create_model(
+        model_name=model_name,
+        generation_config=dict(generation_config),
+        system_instruction=system_instruction,
+        api_key=api_key,
+    )
+    # Quotas are per key, so each key gets its own budgets, backoff and circuit breaker
+    model.rate_limiter = get_limiter(api_key=api_key)
+    return model
+
+def shared_model(api_key, model_name, generation_config, system_instruction=None):
+    """Model handle shared by every session with the same API key and configuration
+
+    Sessions only keep their own chat (start_chat on the shared handle), so
+    users with the same key reuse one client and its connections. The
+    handle carries the rate limiter of its key for limited_send_message.
+    """
+    return _cached_model(get_llm_backend().name, api_key, model_name,
+                         tuple(sorted(generation_config.items())), system_instruction)
+
+@st.cache_resource(show_spinner=False)
+def _cached_arxiv_pool(backend_name, page_size, size):
+    backend = get_search_backend()
+    return ClientPool(lambda: backend.create_client(page_size=page_size), size)
+
+def shared_arxiv_pool(page_size=DEFAULT_PAGE_SIZE, size=ARXIV_POOL_SIZE):
+    """Process-wide pool of arXiv clients; lease one per query so politeness delays are shared"""
+    return _cached_arxiv_pool(get_search_backend().name, page_size, size)
@@ -0,0 +1,124 @@
+import os
+import re
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from paper_store import arxiv_id
+from rate_limit import estimate_tokens
+
+# Upper bound for the results block sent back to the model, however many queries ran
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get('PAPERS_RESULTS_CONTEXT_TOKENS', 12000))
+DEFAULT_ABSTRACT_TOKENS = int(os.environ.get('PAPERS_RESULTS_ABSTRACT_TOKENS', 200))
+DEFAULT_TOP_K = int(os.environ.get('PAPERS_RESULTS_TOP_K', 30))
+RESULTS_HEADER = "### RESULTS:\n"
+# Terms are hashed into this many dimensions; collisions only blur the ranking slightly
+HASH_DIMENSIONS = 2 ** 20
+MAX_CACHED_VECTORS = 50000
+
+_vectors = OrderedDict()
+_vectors_lock = threading.Lock()
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+def term_vector(terms):
+    """Sparse hashed term counts of a list of terms: (sorted dimensions, counts)"""
+    dimensions = np.fromiter((zlib.crc32(term.encode()) % HASH_DIMENSIONS for term in terms),
+                             dtype=np.int64, count=len(terms))
+    return np.unique(dimensions, return_counts=True)
+
+def document_vector(result):
+    """Term vector of a result's title and abstract, cached per arXiv id and version"""
+    with _vectors_lock:
+        vector = _vectors.get(result.entry_id)
+        if vector is not None:
+            _vectors.move_to_end(result.entry_id)
+            return vector
+    vector = term_vector(tokenize(f"{result.title} {result.summary}"))
+    with _vectors_lock:
+        _vectors[result.entry_id] = vector
+        while len(_vectors) > MAX_CACHED_VECTORS:
+            _vectors.popitem(last=False)
+    return vector
+
+def bm25_scores(query_terms, vectors, k1=1.5, b=0.75):
+    """Okapi BM25 score of each document vector for the query terms, as a NumPy array
+
+    Only the query's dimensions matter, so the documents are scattered into
+    a documents x query-terms count matrix and scored with one matrix product.
+    """
+    if not vectors:
+        return np.zeros(0)
+    query_dimensions, _ = term_vector(query_terms)
+    rows = np.repeat(np.arange(len(vectors)), [len(dimensions) for dimensions, _ in vectors])
+    dimensions = np.concatenate([dimensions for dimensions, _ in vectors])
+    counts = np.concatenate([counts for _, counts in vectors]).astype(np.float32)
+    lengths = np.bincount(rows, weights=counts, minlength=len(vectors))
+
+    in_query = np.isin(dimensions, query_dimensions)
+    frequencies = np.zeros((len(vectors), len(query_dimensions)), dtype=np.float32)
+    frequencies[rows[in_query], np.searchsorted(query_dimensions, dimensions[in_query])] = counts[in_query]
+
+    document_frequency = np.count_nonzero(frequencies, axis=0)
+    idf = np.log1p((len(vectors) - document_frequency + 0.5) / (document_frequency + 0.5))
+    norm = k1 * (1 - b + b * lengths / (lengths.mean() or 1))
+    saturated = frequencies * (k1 + 1) / (frequencies + norm[:, None].astype(np.float32))
+    return saturated @ idf.astype(np.float32)
+
+def rank_results(results, prompt, top_k=None):
+    """Results deduplicated by arXiv id, most relevant to the prompt first, at most top_k"""
+    unique = {}
+    for result in results:
+        unique.setdefault(arxiv_id(result), result)
+    unique = list(unique.values())
+    scores = bm25_scores(tokenize(prompt), [document_vector(result) for result in unique])
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [unique[i] for i in order]
+
+def relevant_pages(prompt, min_matching=0.5, min_ratio=0.5):
+    """Paging criterion for iter_query_pages: fetch another page while the latest one stays relevant
+
+    The latest page counts as relevant when at least min_matching of its
+    results match the prompt and its mean BM25 score is at least min_ratio
+    of the first page's.
+    """
+    query_terms = tokenize(prompt)
+
+    def wants_more(pages):
+        first, latest = pages[0], pages[-1]
+        scores = bm25_scores(query_terms, [document_vector(result) for result in first + latest])
+        first_scores, latest_scores = scores[:len(first)], scores[len(first):]
+        return bool(np.mean(latest_scores > 0) >= min_matching
+                    and latest_scores.mean() >= min_ratio * first_scores.mean())
+    return wants_more
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text at a word boundary so it stays within about max_tokens"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+def format_result(result, max_abstract_tokens=DEFAULT_ABSTRACT_TOKENS):
+    summary = truncate_to_tokens(" ".join(result.summary.split()), max_abstract_tokens)
+    journal_ref = f"\n##### Journal Reference: {result.journal_ref}" if result.journal_ref else ""
+    return f"- ####'{result.title}':\n##### arXiv: {arxiv_id(result)}\n##### Abstract: {summary}{journal_ref}\n"
+
+def build_result_context(results, prompt, max_tokens=DEFAULT_CONTEXT_TOKENS,
+                         max_abstract_tokens=DEFAULT_ABSTRACT_TOKENS, top_k=DEFAULT_TOP_K, header=RESULTS_HEADER):
+    """Results block for the answer prompt, bounded by max_tokens
+
+    Results are deduplicated and ranked against the user prompt with BM25;
+    the top_k best are added in order, each with its abstract truncated to
+    max_abstract_tokens, until the token budget is used up.
+    """
+    entries = []
+    budget = max_tokens - estimate_tokens(header)
+    for result in rank_results(results, prompt, top_k):
+        entry = format_result(result, max_abstract_tokens)
+        budget -= estimate_tokens(entry)
+        if budget < 0:
+            break
+        entries.append(entry)
+    return header + "".join(entries)
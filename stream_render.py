@@ -0,0 +1,66 @@
+import re
+import streamlit as st
+
+class StreamingTagRenderer:
+    """Renders a streamed response, replacing <tag>...</tag> spans as they complete.
+
+    Text is scanned from a cursor, so each chunk only costs the text after
+    the last completed tag. Finished paragraphs are frozen into their own
+    markdown element and never redrawn; only the open paragraph at the tail
+    is re-rendered per chunk. Replacements are cached by tag content.
+    """
+
+    def __init__(self, tag, replace):
+        self.open_tag = f"<{tag}>"
+        self.pattern = re.compile(f"<{tag}>(.*?)</{tag}>")
+        self.replace = replace
+        self.cards = {}
+        self._segments = []
+        self._tail = ""
+        self._cursor = 0
+        self._frozen = st.container()
+        self._tail_container = st.empty()
+
+    @property
+    def text(self):
+        """Full response so far, with every completed tag replaced"""
+        return "".join(self._segments) + self._tail
+
+    def _render(self, match):
+        content = match.group(1)
+        if content not in self.cards:
+            self.cards[content] = self.replace(match)
+        return self.cards[content]
+
+    def _replace_completed_tags(self):
+        while match := self.pattern.search(self._tail, self._cursor):
+            card = self._render(match)
+            self._tail = self._tail[:match.start()] + card + self._tail[match.end():]
+            self._cursor = match.start() + len(card)
+        # Park the cursor on an unclosed tag, or just before a possibly split one
+        open_at = self._tail.find(self.open_tag, self._cursor)
+        if open_at >= 0:
+            self._cursor = open_at
+        else:
+            self._cursor = max(self._cursor, len(self._tail) - len(self.open_tag) + 1)
+
+    def _freeze_paragraphs(self):
+        cut = self._tail.rfind("\n\n", 0, self._cursor)
+        # Never split a fenced code block across two markdown elements
+        if cut < 0 or self._tail[:cut].count("```") % 2:
+            return
+        segment, self._tail = self._tail[:cut + 2], self._tail[cut + 2:]
+        self._cursor -= cut + 2
+        self._segments.append(segment)
+        self._frozen.markdown(segment, unsafe_allow_html=True)
+
+    def feed(self, text):
+        self._tail += text
+        self._replace_completed_tags()
+        self._freeze_paragraphs()
+        self._tail_container.markdown(self._tail, unsafe_allow_html=True)
+
+    def finish(self):
+        """Render what is left and return the full processed response"""
+        self._tail_container.markdown(self._tail, unsafe_allow_html=True)
+        return self.text
@@ -1,12 +1,10 @@
 import streamlit as st
-import google.generativeai as genai
-import arxiv
-import Levenshtein
-import re
-import time
-
-query_pattern = r"<query>(.*?)</query>"
-paper_pattern = r"<paper>(.*?)</paper>"
+from chat_history import compact_chat_history
+from transcript import new_message, render_transcript
+from resource_pool import shared_model, shared_arxiv_pool
+from stream_render import StreamingTagRenderer
+from paper_assistant import (MODEL_NAME, GENERATION_CONFIG, SYSTEM_PROMPT, PaperLibrary, ResearchAssistant,
+                             card_replacer, extract_queries)
 
 st.set_page_config(
     page_title="Paper-e  🔍",
@@ -14,8 +12,8 @@ st.set_page_config(
     layout="wide"
     )
 
-if "results" not in st.session_state:
-    st.session_state.results = {}
+if "library" not in st.session_state:
+    st.session_state.library = PaperLibrary()
 
 # Check if API key is already in session state
 if "api_key" not in st.session_state:
@@ -37,58 +35,6 @@ if not st.session_state.api_key: # If API key is not in session state, show the
 
 # Only proceed to configure the model and app if API key is available
 if st.session_state.api_key:
-    genai.configure(api_key=st.session_state.api_key)
-    # Configure functions
-    def find_nearest_key_levenshtein_lib(dictionary, target_key, tolerance):
-        """Finds the nearest string key in a dictionary using python-Levenshtein.
-
-        Args:
-            dictionary: The dictionary with string keys.
-            target_key: The string to search for a near match for.
-            tolerance: The maximum acceptable Levenshtein distance.
-
-        Returns:
-            The nearest key if found within the tolerance, otherwise None.
-        """
-        nearest_key = None
-        min_distance = float('inf')
-
-        for key in dictionary:
-            distance = Levenshtein.distance(key, target_key) # Using library function
-            if distance < min_distance:
-                min_distance = distance
-                nearest_key = key
-
-        if min_distance <= tolerance:
-            return dictionary[nearest_key]
-        else:
-            return None
-
-    def replace_paper_content(match):
-        """
-        Function to transform the content inside <paper> tags and use it as replacement.
-        For this example, we'll just uppercase the content.
-        """
-        paper_content = match.group(1) # Access the captured group (text inside <paper>)
-        result: arxiv.Result = find_nearest_key_levenshtein_lib(st.session_state.results, paper_content, 5)
-        if not result:
-            return "\n[NOT FOUND]\n"
-        
-        # print(result.journal_ref)
-        
-        authors = ", ".join([author.name for author in result.authors])
-        categories = ", ".join([category for category in result.categories])
-        transformed_content = f"""
-<div style="border: 1px solid #e6e9ef; border-radius: 5px; padding: 10px; margin-bottom: 10px;">
-    <h4><a href="{result.links[0].href}" target="_blank">{result.title}</a> <a href="{result.pdf_url}" target="_blank">[PDF]</a></h4>
-    <p><b>Authors:</b> {authors}</p>
-    <p><b>Categories:</b> {categories}</p>{f"\n   <p><b>Journal Reference:</b> {result.journal_ref}</p>" if result.journal_ref else ""}
-    <p><b>Date:</b> {result.published}</p>
-    <p>{result.summary}</p>
-    </div>"""
-        return transformed_content
-
-
     # Configure page
     
 
@@ -110,76 +56,16 @@ if st.session_state.api_key:
 
 
     if "messages" not in st.session_state:
-        st.session_state.generation_config = {
-            "temperature": 1,
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-            }
-
-        genai.configure(api_key=st.session_state.api_key) # Configure genai with API key
-        st.session_state.model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash-lite-preview-02-05",
-            system_instruction="""You are a query creator, reviewer, and answer generator model, you can create arxiv queries using the basic syntax
-Here are some prefixes to indicate the queried field:
-- ti -> Title
-- au -> Author
-- abs -> Abstract
-- co -> Comment
-- jr -> Journal Reference
-- cat -> Subject Category
-- rn -> Report Number
-- id -> Id (use id_list instead)
-- all -> All of the above
-
-some logical operations:
-- AND
-- OR
-- ANDNOT
-The ANDNOT Boolean operator is particularly useful, as it allows us to filter search results based on certain fields. For example, if we wanted all of the articles by the author Adrian DelMaestro with titles that did not contain the word checkerboard, we could construct the following query:
-
-<query>au:del_maestro ANDNOT ti:checkerboard</query>
-
-and agrupation terms like:
-- ( )Used to group Boolean expressions for Boolean operator precedence.
-- double quotes	Used to group multiple words into phrases to search a particular field.
-- space	Used to extend a search_query to include multiple fields.
-
-example: <query>ti:(reasoning AND llm)</query>
-always use the <query></query> and provide multiple queries if needed.
-
-When asked for QUERY you must propose the queries inside <query></query> tags.
-When asked for an ANSWER, you must state a criteria for selecting the papers, then select from the papers the most relevant ones and provide an answer to the user encapsulating the titles of the papers in <paper>TITLE</paper> tags.
-Consider that the <paper></paper> tags will be replaced by a CARD, so put it as an independent line, only containing the tags and title.
-For example:
-<paper>TITLE</paper>
-I would like the final answer to have the following structure:
-1. Think step by step to state the selection criteria for the most relevant papers (consider if it has a journal reference and it is relevant).
-2. Use that criteria and introduce, evaluating the fit to the criteria, the most relevant papers, one by one:
-For example:
-I selected the following papers because [explanation]
-
-<paper>TITLE</paper>
-
-<paper>TITLE</paper>
-
-(continue...)
-
-I also considered those relevant because [explanation]
-
-<paper>TITLE</paper>
-
-<paper>TITLE</paper>
-
-""",
-            generation_config=st.session_state.generation_config,
+        st.session_state.model = shared_model(
+            api_key=st.session_state.api_key,
+            model_name=MODEL_NAME,
+            system_instruction=SYSTEM_PROMPT,
+            generation_config=GENERATION_CONFIG,
         )
 
         st.session_state.chat = st.session_state.model.start_chat(history=[])
-        st.session_state.client = arxiv.Client()
         st.session_state.messages = []
-        st.session_state.results = {}
+        st.session_state.library.clear()
 
     # Title and description
     st.title("Paper-e  🔍")
@@ -196,17 +82,12 @@ I also considered those relevant because [explanation]
     st.caption("search for papers")
 
     # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"], unsafe_allow_html=True)
+    render_transcript(st.session_state.messages)
 
     # Chat input and logic
     if prompt := st.chat_input("enter a query..."):
         # Add user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        st.session_state.messages.append(new_message("user", prompt))
 
         # Display user message
         with st.chat_message("user"):
@@ -214,6 +95,8 @@ I also considered those relevant because [explanation]
 
         # Generate and stream response
         with st.chat_message("assistant"):
+            assistant = ResearchAssistant(st.session_state.chat, st.session_state.library,
+                                          client_pool=shared_arxiv_pool())
             feedback_container = st.empty()  # Create an empty container for streaming
             feedback_container.markdown("Sending request...")  # Initial feedback message
             queries_response = ""
@@ -221,62 +104,42 @@ I also considered those relevant because [explanation]
 
             # Stream the response from Gemini
 
-            for chunk in st.session_state.chat.send_message(f"generate a QUERY or QUERIES for the user prompt (remember the use of <query></query>):\n'{prompt}'\n\n (If the user only asks for clarification you can just use the responses from the previous queries)", stream = True):
-                queries_response += chunk.text
+            for text in assistant.stream_queries(prompt):
+                queries_response += text
                 feedback_container.markdown(queries_response)
             
             feedback_container.empty()
             
-            found = 0
-            queries = re.findall(query_pattern, queries_response)
-            result_to_prompt = "### RESULTS:\n"
-            qur_cnt = []
+            queries = extract_queries(queries_response)
+            turn_results = []
+            # One feedback line per query, all queries running at once
+            qur_cnt = {}
             for query in queries:
-                qur_cnt = []
-                qur_cnt.append(st.empty())
-                qur_cnt[-1].markdown("Processing query: $"+query+"")
-                search = arxiv.Search(
-                    query=query,
-                    max_results=100,
-                    sort_by=arxiv.SortCriterion.Relevance
-                )
-                results = st.session_state.client.results(search)
-                qur_cnt.append(st.empty())
-                for result in results:
-                    found += 1
-                    # time.sleep(0.07)
-                    qur_cnt[-1].markdown("- Added document: '"+result.title+"'")
-                    st.session_state.results[result.title] = result
-                    result_to_prompt+=f"""- ####'{result.title}':
-##### Abstract: {result.summary}{f"\n##### Journal Reference: {result.journal_ref}" if result.journal_ref else ""}
-"""
-            qur_cnt = []
+                qur_cnt[query] = st.empty()
+                qur_cnt[query].markdown("Processing query: $"+query+"")
+            for query, result, error in assistant.search(queries, prompt):
+                if error:
+                    qur_cnt[query].markdown("- Query failed: '"+query+"' ("+str(error)+")")
+                    continue
+                qur_cnt[query].markdown("- Added document: '"+result.title+"'")
+                turn_results.append(result)
+            qur_cnt = {}
             feedback_container.empty()
             feedback_container.markdown("Waiting for answer")
-            response_container = st.empty()  # Create an empty container for streaming
-            full_response = ""
+            renderer = StreamingTagRenderer("paper", card_replacer(st.session_state.library))
 
-            if found>0:
-                prompt = f"These are the results to the queries:\n{result_to_prompt}\nUse them to generate an ANSWER (Remember to include the <paper>TITLE</paper> tags for each answer, and state them in isolated lines (as they will be converted to cards with the info))."
-            else:
-                prompt = "The user probably only asked for clarification, check for it. (Remember to include the <paper>TITLE</paper> tags for each answer)."
             # Stream the response from Gemini
-            chunkn = 0
-            for chunk in st.session_state.chat.send_message(prompt, stream=True):
-                chunkn+=1
-                full_response += chunk.text
-                if chunkn%100==0:
-                    full_response = re.sub(paper_pattern, replace_paper_content, full_response)
-                response_container.markdown(full_response, unsafe_allow_html=True)  # Update the container with new text
+            for text in assistant.stream_answer(prompt, turn_results):
+                renderer.feed(text)
 
-            full_response = re.sub(paper_pattern, replace_paper_content, full_response)
+            full_response = renderer.finish()
 
 
         # Add assistant response to history
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": full_response
-        })
+        st.session_state.messages.append(new_message("assistant", full_response))
+
+        # Keep the history sent with every request within its token budget
+        compact_chat_history(st.session_state.chat)
 
         # Rerun to show new messages
         st.rerun()
\ No newline at end of file
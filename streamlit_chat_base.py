@@ -1,6 +1,9 @@
 import streamlit as st
-import google.generativeai as genai
 import re
+from rate_limit import limited_send_message
+from chat_history import compact_chat_history
+from transcript import new_message, render_transcript
+from resource_pool import shared_model
 
 query_pattern = r"<query>(.*?)</query>"
 paper_pattern = r"<paper>(.*?)</paper>"
@@ -32,7 +35,6 @@ if not st.session_state.api_key: # If API key is not in session state, show the
 
 # Only proceed to configure the model and app if API key is available
 if st.session_state.api_key:
-    genai.configure(api_key=st.session_state.api_key)
     # Configure functions
 
     # Custom CSS to make the central column wider
@@ -61,8 +63,8 @@ if st.session_state.api_key:
             "response_mime_type": "text/plain",
             }
 
-        genai.configure(api_key=st.session_state.api_key) # Configure genai with API key
-        st.session_state.model = genai.GenerativeModel(
+        st.session_state.model = shared_model(
+            api_key=st.session_state.api_key,
             model_name="gemini-2.0-flash-lite-preview-02-05",
             generation_config=st.session_state.generation_config,
         )
@@ -85,17 +87,12 @@ if st.session_state.api_key:
     st.caption("search for papers")
 
     # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])#, unsafe_allow_html=True)
+    render_transcript(st.session_state.messages, unsafe_allow_html=False)
 
     # Chat input and logic
     if prompt := st.chat_input("enter a query..."):
         # Add user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        st.session_state.messages.append(new_message("user", prompt))
 
         # Display user message
         with st.chat_message("user"):
@@ -107,16 +104,16 @@ if st.session_state.api_key:
             full_response = ""
 
             # Stream the response from Gemini
-            for chunk in st.session_state.chat.send_message(prompt, stream=True):
+            for chunk in limited_send_message(st.session_state.chat, prompt, stream=True):
                 full_response += chunk.text
                 response_container.markdown(full_response)#, unsafe_allow_html=True)  # Update the container with new text
 
 
         # Add assistant response to history
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": full_response
-        })
+        st.session_state.messages.append(new_message("assistant", full_response))
+
+        # Keep the history sent with every request within its token budget
+        compact_chat_history(st.session_state.chat)
 
         # Rerun to show new messages
         st.rerun()
\ No newline at end of file
@@ -3,6 +3,8 @@ import re
 import google.generativeai as genai
 import os
 import time
+from rate_limit import limited_send_message
+from backends import get_llm_backend
 
 # --- Set up Gemini API Key ---
 gemini_api_key = st.secrets.get("GEMINI_API_KEY") or st.sidebar.text_input(
@@ -45,7 +47,7 @@ def setup_gemini_model():
         "response_mime_type": "text/plain",
     }
 
-    model = genai.GenerativeModel(
+    model = get_llm_backend().create_model(
         model_name="gemini-2.0-flash-thinking-exp-01-21", # or a suitable Gemini model
         generation_config=generation_config,
     )
@@ -58,7 +60,7 @@ def process_query_gemini(query, chat_session, pdf_file_gemini):
         return "Please enter your Gemini API key to use the chatbot.", None
 
     try:
-        response = chat_session.send_message([query, pdf_file_gemini]) # Send query and Gemini file
+        response = limited_send_message(chat_session, [query, pdf_file_gemini]) # Send query and Gemini file
         answer = response.text
 
         ref_text = None
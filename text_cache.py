@@ -0,0 +1,131 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'PAPERS_TEXT_CACHE',
+    os.path.join(os.getcwd(), '.papers_cache', 'pdf_text.sqlite3'),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('PAPERS_TEXT_CACHE_MAX_MB', 256)) * 1024 * 1024
+# Bump when the key or the extraction changes; older caches are dropped on open
+SCHEMA_VERSION = 2
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TextCache:
+    """On-disk cache of extracted PDF text keyed by content hash and extraction limits.
+
+    Entries live in a SQLite file so every script, process and thread sees the
+    same cache. When the stored text grows past max_bytes, the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS pdf_text")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("""CREATE TABLE IF NOT EXISTS pdf_text (
+                digest TEXT NOT NULL,
+                max_pages INTEGER NOT NULL,
+                max_chars INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, max_pages, max_chars)
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS pdf_text_last_used ON pdf_text (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the cache safe to use
+        # from worker processes and threads alike
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, digest, max_pages, max_chars):
+        """Return cached text or None"""
+        key = (digest, max_pages, max_chars)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text FROM pdf_text WHERE digest = ? AND max_pages = ? AND max_chars = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE pdf_text SET last_used = ? WHERE digest = ? AND max_pages = ? AND max_chars = ?",
+                (time.time(), *key),
+            )
+        return row[0]
+
+    def put(self, digest, max_pages, max_chars, text):
+        """Store text and evict old entries if the cache is over its size limit"""
+        size = len(text.encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pdf_text VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, max_pages, max_chars, text, size, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pdf_text").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for digest, max_pages, max_chars, size in conn.execute(
+                "SELECT digest, max_pages, max_chars, size FROM pdf_text ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((digest, max_pages, max_chars))
+            total -= size
+        conn.executemany(
+            "DELETE FROM pdf_text WHERE digest = ? AND max_pages = ? AND max_chars = ?", stale
+        )
+
+    def get_or_extract(self, pdf_path, extract, max_pages, max_chars, digest=None):
+        """Return the text of pdf_path, calling extract(pdf_path, max_pages, max_chars) only on a miss
+
+        Pass digest when the caller has already hashed the file, to save reading it again.
+        """
+        if digest is None:
+            try:
+                digest = file_sha256(pdf_path)
+            except OSError as e:
+                print(f"Error hashing {pdf_path}: {e}")
+                return extract(pdf_path, max_pages, max_chars)
+
+        text = self.get(digest, max_pages, max_chars)
+        if text is None:
+            text = extract(pdf_path, max_pages, max_chars)
+            self.put(digest, max_pages, max_chars, text)
+        return text
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_text_cache():
+    """Process-wide TextCache at DEFAULT_CACHE_PATH"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TextCache()
+        return _default_cache
@@ -0,0 +1,56 @@
+import threading
+import time
+from contextlib import contextmanager
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class StageTimings:
+    """Thread-safe accumulator of per-stage durations in seconds"""
+
+    def __init__(self, stages=()):
+        self._lock = threading.Lock()
+        self._stages = tuple(stages)
+        self._durations = {stage: [] for stage in self._stages}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._durations = {stage: [] for stage in self._stages}
+
+    def summary(self):
+        """Return {stage: {"count", "total", "mean", "p50", "p90", "p99", "max"}} in seconds"""
+        with self._lock:
+            durations_by_stage = {stage: sorted(durations) for stage, durations in self._durations.items()}
+        return {
+            stage: {
+                "count": len(durations),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations) if durations else 0.0,
+                "p50": percentile(durations, 0.50),
+                "p90": percentile(durations, 0.90),
+                "p99": percentile(durations, 0.99),
+                "max": durations[-1] if durations else 0.0,
+            }
+            for stage, durations in durations_by_stage.items()
+        }
+
+    def print_summary(self):
+        for stage, stats in self.summary().items():
+            print(f"{stage}: {stats['count']} calls, {stats['total']:.3f}s total, "
+                  f"{stats['mean'] * 1000:.1f}ms mean, {stats['p90'] * 1000:.1f}ms p90")
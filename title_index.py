@@ -0,0 +1,78 @@
+from collections import Counter, defaultdict
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
+
+NGRAM = 3
+
+def normalize_title(title):
+    """Casefold and collapse whitespace so cosmetic differences never cost edits"""
+    return " ".join(title.casefold().split())
+
+def title_ngrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+class TitleIndex:
+    """Resolves possibly misspelled paper titles to arXiv ids.
+
+    Exact matches are a hash lookup on the normalized title. Otherwise the
+    trigram index keeps only titles that share enough trigrams to be within
+    max_distance edits, and RapidFuzz picks the closest of those.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._titles = {}
+        self._ngrams = {}
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def add(self, paper_id, title):
+        normalized = normalize_title(title)
+        old = self._titles.get(paper_id)
+        if old == normalized:
+            return
+        if old is not None:
+            self.remove(paper_id)
+        self._exact[normalized] = paper_id
+        self._titles[paper_id] = normalized
+        self._ngrams[paper_id] = title_ngrams(normalized)
+        for ngram in self._ngrams[paper_id]:
+            self._postings[ngram].add(paper_id)
+
+    def remove(self, paper_id):
+        normalized = self._titles.pop(paper_id, None)
+        if normalized is None:
+            return
+        if self._exact.get(normalized) == paper_id:
+            del self._exact[normalized]
+        for ngram in self._ngrams.pop(paper_id):
+            self._postings[ngram].discard(paper_id)
+
+    def clear(self):
+        self.__init__()
+
+    def _candidates(self, normalized, max_distance):
+        ngrams = title_ngrams(normalized)
+        # Each edit destroys at most NGRAM of the query's trigrams
+        required = len(ngrams) - NGRAM * max_distance
+        if required <= 0:
+            return self._titles
+        shared = Counter()
+        for ngram in ngrams:
+            shared.update(self._postings.get(ngram, ()))
+        return {paper_id: self._titles[paper_id] for paper_id, count in shared.items() if count >= required}
+
+    def resolve(self, title, max_distance=5):
+        """arXiv id of the title within max_distance edits of the given one, or None"""
+        normalized = normalize_title(title)
+        paper_id = self._exact.get(normalized)
+        if paper_id is not None:
+            return paper_id
+        candidates = self._candidates(normalized, max_distance)
+        if not candidates:
+            return None
+        match = process.extractOne(normalized, candidates, scorer=Levenshtein.distance, score_cutoff=max_distance)
+        return match[2] if match else None
@@ -0,0 +1,41 @@
+import os
+import uuid
+import streamlit as st
+
+# Messages drawn on a rerun; older ones are loaded a window at a time on request
+TRANSCRIPT_WINDOW = int(os.environ.get('PAPERS_TRANSCRIPT_WINDOW', 20))
+RESULTS_PAGE_SIZE = int(os.environ.get('PAPERS_RESULTS_PAGE_SIZE', 20))
+
+def new_message(role, content):
+    """Chat message with a stable id"""
+    return {"id": uuid.uuid4().hex, "role": role, "content": content}
+
+def cached_fragment(key, build):
+    """Fragment for key from the session's render cache, building it on a miss"""
+    cache = st.session_state.setdefault("render_cache", {})
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = cache[key] = build()
+    return fragment
+
+def render_transcript(messages, unsafe_allow_html=True, window=TRANSCRIPT_WINDOW):
+    """Draw the last messages of the transcript
+
+    Only the newest window messages are drawn; a button loads older ones a
+    window at a time.
+    """
+    shown = st.session_state.setdefault("transcript_window", window)
+    hidden = len(messages) - shown
+    if hidden > 0 and st.button(f"Show earlier messages ({hidden} hidden)"):
+        shown = st.session_state.transcript_window = shown + window
+    visible = messages[max(0, len(messages) - shown):]
+
+    for message in visible:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"], unsafe_allow_html=unsafe_allow_html)
+
+def paginate(items, page_size=RESULTS_PAGE_SIZE, key="page"):
+    """The items of the page picked with a page selector (shown only when there is more than one page)"""
+    pages = max(1, -(-len(items) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key) if pages > 1 else 1
+    return items[(page - 1) * page_size:page * page_size]